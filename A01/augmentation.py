@@ -0,0 +1,128 @@
+"""Batched rotation augmentation for the digit classification pipeline.
+
+Rotation matrices are computed once per (angle, image size). The sampled images
+are grouped by angle and warped four at a time as the channels of one
+image, which OpenCV processes in a single bit-identical call, and the results
+are written straight into a preallocated uint8 array. Large jobs can be spread
+over a process pool; the samples are drawn up front, so the output only
+depends on the seed.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# OpenCV warps up to 4 channels with the same per-pixel arithmetic as 1 channel
+CHANNELS_PER_WARP = 4
+CHUNK_SIZE = 8192
+
+_source_images = None
+
+
+@lru_cache(maxsize=None)
+def rotation_matrix(degrees, num_rows, num_cols):
+    """
+    Returns the cached affine matrix rotating a (num_rows, num_cols) image about its center.
+    """
+    return cv2.getRotationMatrix2D((num_cols / 2, num_rows / 2), degrees, 1)
+
+
+def apply_rotation(image, degrees):
+    """
+    Rotates an image by a specified angle using OpenCV's affine transformation.
+
+    Parameters:
+    - image (numpy array): The image to rotate.
+    - degrees (float): The angle in degrees to rotate the image.
+
+    Returns:
+    - numpy array: The rotated image.
+    """
+    num_rows, num_cols = image.shape[:2]
+    return cv2.warpAffine(image, rotation_matrix(degrees, num_rows, num_cols), (num_cols, num_rows))
+
+
+def rotate_batch(images, degrees, out=None):
+    """
+    Rotates a batch of images by the same angle, four images per OpenCV call.
+
+    Parameters:
+    - images (numpy array): uint8 images of shape (n, rows, cols).
+    - degrees (float): The angle in degrees to rotate the images.
+    - out (numpy array, optional): Array of the same shape to write the rotated images into.
+
+    Returns:
+    - numpy array: The rotated images.
+    """
+    count, num_rows, num_cols = images.shape
+    if out is None:
+        out = np.empty_like(images)
+    matrix = rotation_matrix(degrees, num_rows, num_cols)
+    num_warps = -(-count // CHANNELS_PER_WARP)
+    packed = np.zeros((num_warps * CHANNELS_PER_WARP, num_rows, num_cols), dtype=np.uint8)
+    packed[:count] = images
+    packed = np.ascontiguousarray(packed.reshape(num_warps, CHANNELS_PER_WARP, num_rows, num_cols).transpose(0, 2, 3, 1))
+    rotated = np.empty_like(packed)
+    for i in range(num_warps):
+        cv2.warpAffine(packed[i], matrix, (num_cols, num_rows), dst=rotated[i])
+    out[:] = rotated.transpose(0, 3, 1, 2).reshape(-1, num_rows, num_cols)[:count]
+    return out
+
+
+def _init_worker(images):
+    global _source_images
+    _source_images = images
+
+
+def _rotate_indices(indices, degrees):
+    return rotate_batch(_source_images[indices], degrees)
+
+
+def augment_images(data, oversampling_factor, rotation_choices, seed=None, workers=0, chunk_size=CHUNK_SIZE):
+    """
+    Augments a dataset by rotating images and oversampling to artificially increase the dataset size.
+
+    Parameters:
+    - data (tuple): A tuple containing images and their labels (images, labels).
+    - oversampling_factor (float): The factor by which to oversample the data.
+    - rotation_choices (list): A list of angles from which one will be randomly selected for each image rotation.
+    - seed (int or numpy Generator, optional): Seed or generator for picking the images and angles.
+    - workers (int): Number of worker processes for the rotations; 0 rotates in this process.
+    - chunk_size (int): Number of images rotated per task.
+
+    Returns:
+    - tuple: A tuple containing the augmented images and labels, the originals first.
+    """
+    images, labels = data
+    total_images = images.shape[0]
+    extra_samples = int(total_images * (oversampling_factor - 1))
+
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, total_images, extra_samples)
+    choices = rng.integers(0, len(rotation_choices), extra_samples)
+    # Group the samples by angle so every chunk shares one rotation matrix
+    order = np.argsort(choices, kind='stable')
+    indices, choices = indices[order], choices[order]
+
+    augmented_imgs = np.empty((total_images + extra_samples,) + images.shape[1:], dtype=np.uint8)
+    augmented_imgs[:total_images] = images
+    augmented_lbls = np.concatenate([labels, labels[indices]])
+
+    tasks = []
+    bounds = np.searchsorted(choices, np.arange(len(rotation_choices) + 1))
+    for choice, degrees in enumerate(rotation_choices):
+        for start in range(bounds[choice], bounds[choice + 1], chunk_size):
+            tasks.append((start, min(start + chunk_size, bounds[choice + 1]), degrees))
+
+    target = augmented_imgs[total_images:]
+    if workers and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(images,)) as executor:
+            results = executor.map(_rotate_indices, [indices[start:end] for start, end, _ in tasks],
+                                   [degrees for _, _, degrees in tasks])
+            for (start, end, _), rotated in zip(tasks, results):
+                target[start:end] = rotated
+    else:
+        for start, end, degrees in tasks:
+            rotate_batch(images[indices[start:end]], degrees, out=target[start:end])
+    return augmented_imgs, augmented_lbls
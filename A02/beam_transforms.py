@@ -0,0 +1,169 @@
+"""Apache Beam building blocks for the NCEI LCD analytics pipeline.
+
+Kept free of Airflow imports so the transforms can be run and benchmarked
+on their own; saic.py wires them into the Analytics_Pipeline DAG.
+"""
+import csv
+import io
+import math
+from typing import Tuple
+
+import apache_beam as beam
+import pyarrow as pa
+from apache_beam.io import fileio
+
+# (latitude, longitude, month, (required field values...))
+LCDRow = Tuple[float, float, int, Tuple[float, ...]]
+
+
+def resolve_field_indices(header, required_fields):
+    """Map each required field to the first column whose name ends with it,
+    e.g. 'WindSpeed' -> 'HourlyWindSpeed', 'BulbTemperature' -> 'HourlyDryBulbTemperature'."""
+    indices = []
+    for field in required_fields:
+        matches = [i for i, column in enumerate(header) if column.endswith(field)]
+        if not matches:
+            raise ValueError(f"Field '{field}' not found in the CSV header")
+        indices.append(matches[0])
+    return indices
+
+
+def to_float(value):
+    """Parse an LCD value, keeping the number of flagged values such as '0.12s'; NaN otherwise."""
+    value = value.strip().rstrip('s*')
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+@beam.typehints.with_output_types(LCDRow)
+class ReadLCDRows(beam.DoFn):
+    """Read matched LCD CSV files into (lat, lon, month, values) tuples.
+
+    Rows are parsed with the csv module, so quoted commas and the outer quotes
+    are handled. The header is consumed once per file and the required columns
+    are resolved to indices there, leaving only index lookups per row.
+    """
+
+    def __init__(self, required_fields):
+        self.required_fields = required_fields
+
+    def setup(self):
+        self.fields = [field.strip() for field in self.required_fields]
+
+    def process(self, readable_file):
+        with io.TextIOWrapper(readable_file.open(), encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            date_index = header.index('DATE')
+            lat_index = header.index('LATITUDE')
+            lon_index = header.index('LONGITUDE')
+            field_indices = resolve_field_indices(header, self.fields)
+            width = max(date_index, lat_index, lon_index, *field_indices) + 1
+            for row in reader:
+                if len(row) < width:
+                    continue
+                try:
+                    lat, lon = float(row[lat_index]), float(row[lon_index])
+                    month = int(row[date_index][5:7])
+                except ValueError:
+                    continue
+                yield lat, lon, month, tuple([to_float(row[i]) for i in field_indices])
+
+
+class ReadLCD(beam.PTransform):
+    """Typed LCD rows from every CSV file matching `file_pattern`."""
+
+    def __init__(self, file_pattern, required_fields):
+        super().__init__()
+        self.file_pattern = file_pattern
+        self.required_fields = required_fields
+
+    def expand(self, pbegin):
+        return (
+            pbegin
+            | 'MatchFiles' >> fileio.MatchFiles(self.file_pattern)
+            | 'ReadMatches' >> fileio.ReadMatches()
+            | 'ParseRows' >> beam.ParDo(ReadLCDRows(self.required_fields))
+        )
+
+
+def has_all_values(row):
+    """True when none of the required values of an LCD row is missing."""
+    return not any(math.isnan(value) for value in row[3])
+
+
+class MeanCombineFn(beam.CombineFn):
+    """Per-position mean of fixed-length value lists, ignoring NaNs.
+
+    The accumulator is ([sums], [counts]), so partial means are combined
+    before the shuffle instead of shipping every raw value to one worker.
+    """
+
+    def __init__(self, n_values):
+        self.n_values = n_values
+
+    def create_accumulator(self):
+        return [0.0] * self.n_values, [0] * self.n_values
+
+    def add_input(self, accumulator, values):
+        sums, counts = accumulator
+        for i, value in enumerate(values):
+            if value == value:  # skip NaN
+                sums[i] += value
+                counts[i] += 1
+        return sums, counts
+
+    def merge_accumulators(self, accumulators):
+        sums, counts = self.create_accumulator()
+        for partial_sums, partial_counts in accumulators:
+            for i in range(self.n_values):
+                sums[i] += partial_sums[i]
+                counts[i] += partial_counts[i]
+        return sums, counts
+
+    def extract_output(self, accumulator):
+        sums, counts = accumulator
+        return [total / count if count else math.nan for total, count in zip(sums, counts)]
+
+
+class ProcessCSV(beam.PTransform):
+    """(lat, lon, [values, ...]) of every station, from typed LCD rows."""
+
+    def expand(self, rows):
+        return (
+            rows
+            | 'FilterAndCreateTuple' >> beam.Filter(has_all_values)
+            | 'KeyByLocation' >> beam.Map(lambda row: ((row[0], row[1]), row[3]))
+            | 'CombineTuple' >> beam.GroupByKey()
+            | 'UnpackTuple' >> beam.Map(lambda a: (a[0][0], a[0][1], list(a[1])))
+        )
+
+
+def averages_schema(required_fields):
+    """Arrow schema of the monthly averages records: one column per required field."""
+    return pa.schema(
+        [('latitude', pa.float64()), ('longitude', pa.float64()), ('month', pa.int8())]
+        + [(field, pa.float64()) for field in required_fields]
+    )
+
+
+class ComputeMonthlyAverages(beam.PTransform):
+    """One flat record per station and month, matching `averages_schema`, from typed LCD rows."""
+
+    def __init__(self, required_fields):
+        super().__init__()
+        self.required_fields = list(required_fields)
+
+    def expand(self, rows):
+        fields = self.required_fields
+        return (
+            rows
+            | 'CreateTupleWithMonthInKey' >> beam.Map(lambda row: ((row[0], row[1], row[2]), row[3]))
+            | 'ComputeAverages' >> beam.CombinePerKey(MeanCombineFn(len(fields)))
+            | 'ToRecords' >> beam.Map(lambda a: dict(
+                zip(['latitude', 'longitude', 'month'], a[0]), **dict(zip(fields, a[1]))))
+        )
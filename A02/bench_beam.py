@@ -0,0 +1,115 @@
+"""Benchmark the Analytics_Pipeline Beam stages on the DirectRunner.
+
+Writes a year of synthetic hourly LCD files and compares the previous layout
+(two pipelines, each reading the CSVs, monthly means via GroupByKey) with the
+shared-read pipeline that combines monthly means per key.
+
+Usage: python bench_beam.py [--stations 4] [--workdir /tmp/bench_beam]
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import apache_beam as beam
+
+from beam_transforms import ComputeMonthlyAverages, ProcessCSV, ReadLCD
+
+REQUIRED_FIELDS = ['WindSpeed', 'BulbTemperature']
+HEADER = ['STATION', 'DATE', 'LATITUDE', 'LONGITUDE', 'ELEVATION', 'NAME', 'REPORT_TYPE', 'SOURCE',
+          'HourlyAltimeterSetting', 'HourlyDewPointTemperature', 'HourlyDryBulbTemperature',
+          'HourlyPrecipitation', 'HourlyRelativeHumidity', 'HourlyWetBulbTemperature',
+          'HourlyWindDirection', 'HourlyWindSpeed']
+
+
+def write_synthetic_station(path, station, seed):
+    """Write one station with an hourly row for every hour of 2002."""
+    rng = random.Random(seed)
+    lat, lon = f"{rng.uniform(25, 49):.4f}", f"{rng.uniform(-124, -67):.4f}"
+    start = datetime(2002, 1, 1)
+    with open(path, 'w') as f:
+        f.write('"' + '","'.join(HEADER) + '"\n')
+        for hour in range(365 * 24):
+            date = (start + timedelta(hours=hour)).strftime('%Y-%m-%dT%H:%M:%S')
+            temp = f"{rng.uniform(-10, 35):.0f}" if rng.random() > 0.05 else ''
+            wind = f"{rng.uniform(0, 20):.0f}" if rng.random() > 0.05 else 'M'
+            row = [station, date, lat, lon, '100.0', f'STATION {station}', 'FM-15', '7',
+                   '30.01', '10', temp, '0.00', '70', '12', '180', wind]
+            f.write('"' + '","'.join(row) + '"\n')
+
+
+def legacy_compute_avg(element):
+    """Monthly mean the previous way: materialise every grouped value list."""
+    (lat, lon, month), values = element
+    values = list(values)
+    columns = list(zip(*values))
+    means = []
+    for column in columns:
+        present = [v for v in column if not math.isnan(v)]
+        means.append(sum(present) / len(present) if present else math.nan)
+    return dict(latitude=lat, longitude=lon, month=month, **dict(zip(REQUIRED_FIELDS, means)))
+
+
+def run_legacy(pattern, out_dir):
+    """Two pipelines, each re-reading the CSVs."""
+    with beam.Pipeline(runner='DirectRunner') as p:
+        rows = p | 'ReadCSV' >> ReadLCD(pattern, REQUIRED_FIELDS)
+        rows | ProcessCSV() | beam.io.WriteToText(os.path.join(out_dir, 'legacy_result.txt'))
+    with beam.Pipeline(runner='DirectRunner') as p:
+        (
+            p
+            | 'ReadCSV' >> ReadLCD(pattern, REQUIRED_FIELDS)
+            | 'CreateTupleWithMonthInKey' >> beam.Map(lambda row: ((row[0], row[1], row[2]), row[3]))
+            | 'CombineTupleMonthly' >> beam.GroupByKey()
+            | 'ComputeAverages' >> beam.Map(legacy_compute_avg)
+            | beam.io.WriteToText(os.path.join(out_dir, 'legacy_averages.txt'))
+        )
+
+
+def run_combined(pattern, out_dir):
+    """One read shared by both outputs, monthly means via CombinePerKey."""
+    with beam.Pipeline(runner='DirectRunner') as p:
+        rows = p | 'ReadCSV' >> ReadLCD(pattern, REQUIRED_FIELDS)
+        rows | ProcessCSV() | 'WriteResult' >> beam.io.WriteToText(os.path.join(out_dir, 'result.txt'))
+        (rows | ComputeMonthlyAverages(REQUIRED_FIELDS)
+         | 'WriteAverages' >> beam.io.WriteToText(os.path.join(out_dir, 'averages.txt')))
+
+
+def read_output(out_dir, prefix):
+    lines = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith(prefix):
+            with open(os.path.join(out_dir, name)) as f:
+                lines.extend(f.read().splitlines())
+    return sorted(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--workdir', default='/tmp/bench_beam')
+    args = parser.parse_args()
+
+    data_dir = os.path.join(args.workdir, 'data')
+    out_dir = os.path.join(args.workdir, 'results')
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    os.makedirs(data_dir)
+    os.makedirs(out_dir)
+    for i in range(args.stations):
+        write_synthetic_station(os.path.join(data_dir, f'{i:011d}.csv'), f'{i:011d}', seed=i)
+    pattern = os.path.join(data_dir, '*.csv')
+
+    for name, run in [('legacy (2 reads, GroupByKey)', run_legacy), ('combined (1 read, CombinePerKey)', run_combined)]:
+        start = time.perf_counter()
+        run(pattern, out_dir)
+        print(f"{name:34s} {time.perf_counter() - start:7.2f} s")
+
+    same = read_output(out_dir, 'legacy_averages.txt') == read_output(out_dir, 'averages.txt')
+    print(f"monthly averages identical: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Check and benchmark fetch.py against a local stand-in for the NCEI server.
+
+Serves synthetic LCD CSVs from a threaded HTTP server with per-request latency,
+failing the first request for every third file with a 503 to exercise retries.
+Times the previous flow (serial downloads to disk, make_archive, move) against
+fetch_to_archive, and checks that the archive holds every file byte for byte.
+
+Usage: python bench_fetch.py [--files 16] [--latency-ms 200] [--workers 8]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from bench_beam import write_synthetic_station
+from fetch import fetch_to_archive
+
+
+def make_handler(root, latency, flaky):
+    failed = set()
+    lock = threading.Lock()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=root, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            name = os.path.basename(self.path)
+            with lock:
+                fail = name in flaky and name not in failed
+                failed.add(name)
+            if fail:
+                self.send_error(503)
+                return
+            super().do_GET()
+
+    return Handler
+
+
+class StandInServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under concurrent load
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def serial_fetch(urls, data_dir, archive_path):
+    """The previous flow: one download at a time to disk, then zip, then move."""
+    os.makedirs(data_dir)
+    for url in urls:
+        for attempt in range(4):
+            response = requests.get(url)
+            if response.status_code == 200:
+                break
+            time.sleep(0.5 * 2 ** attempt)
+        with open(os.path.join(data_dir, os.path.basename(url)), 'wb') as f:
+            f.write(response.content)
+    shutil.make_archive(data_dir.rstrip('/'), 'zip', data_dir)
+    shutil.move(f"{data_dir.rstrip('/')}.zip", archive_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_fetch_')
+    root = os.path.join(workdir, 'server')
+    year_dir = os.path.join(root, '2002')
+    os.makedirs(year_dir)
+    names = [f"{i:011d}.csv" for i in range(args.files)]
+    for i, name in enumerate(names):
+        write_synthetic_station(os.path.join(year_dir, name), name[:-4], seed=i)
+
+    try:
+        for label, run in [('serial + make_archive', 'serial'), (f'fetch_to_archive ({args.workers} workers)', 'concurrent')]:
+            # A fresh server per run so each run sees the same transient failures
+            server = StandInServer(('127.0.0.1', 0), make_handler(root, args.latency_ms / 1000, set(names[::3])))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            urls = [f"http://127.0.0.1:{server.server_port}/2002/{name}" for name in names]
+            archive_path = os.path.join(workdir, f'{run}.zip')
+            start = time.perf_counter()
+            if run == 'serial':
+                serial_fetch(urls, os.path.join(workdir, 'data', '2002'), archive_path)
+            else:
+                fetch_to_archive(urls, archive_path, workers=args.workers)
+            print(f"{label:32s} {time.perf_counter() - start:6.2f} s")
+            server.shutdown()
+
+            with zipfile.ZipFile(archive_path) as archive:
+                intact = sorted(archive.namelist()) == names and all(
+                    archive.read(name) == open(os.path.join(year_dir, name), 'rb').read() for name in names)
+            print(f"{'':32s} all {len(names)} files intact: {intact}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Per-element parsing throughput of the A02 LCD readers.
+
+Compares the previous approach (ReadFromText, split on '","' and column
+indices re-derived for every element) with ReadLCD, which parses with the
+csv module and resolves the header once per file. Both are timed as plain
+Python per row and as DirectRunner pipelines.
+
+Usage: python bench_parse.py [--stations 4] [--workdir /tmp/bench_parse]
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+
+import apache_beam as beam
+
+from beam_transforms import ReadLCD, ReadLCDRows, resolve_field_indices, to_float
+from bench_beam import REQUIRED_FIELDS, write_synthetic_station
+
+
+def legacy_parse(line, header, required_fields):
+    """The previous per-element path: naive split, indices looked up every time."""
+    fields = line.split('","')
+    if fields[0].startswith('"STATION'):
+        return None
+    names = [name.strip('"') for name in header]
+    indices = resolve_field_indices(names, required_fields)
+    lat, lon = fields[names.index('LATITUDE')], fields[names.index('LONGITUDE')]
+    month = int(fields[names.index('DATE')][5:7])
+    return lat, lon, month, [to_float(fields[i].strip('"')) for i in indices]
+
+
+class FakeReadableFile:
+    """Minimal stand-in for fileio.ReadableFile so ReadLCDRows can run outside a pipeline."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def open(self):
+        return open(self.path, 'rb')
+
+
+def time_plain(paths):
+    """Rows per second of each parser called directly, without Beam overhead."""
+    start = time.perf_counter()
+    n_legacy = 0
+    for path in paths:
+        with open(path) as f:
+            header = f.readline().strip().split('","')
+            for line in f:
+                if legacy_parse(line, header, REQUIRED_FIELDS) is not None:
+                    n_legacy += 1
+    legacy = n_legacy / (time.perf_counter() - start)
+
+    reader = ReadLCDRows(REQUIRED_FIELDS)
+    reader.setup()
+    start = time.perf_counter()
+    n_rows = sum(1 for path in paths for _ in reader.process(FakeReadableFile(path)))
+    current = n_rows / (time.perf_counter() - start)
+    return n_rows, legacy, current
+
+
+def time_pipeline(pattern, build):
+    """Rows per second of a DirectRunner pipeline that parses and counts every row."""
+    start = time.perf_counter()
+    with beam.Pipeline(runner='DirectRunner') as p:
+        build(p) | beam.combiners.Count.Globally()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--workdir', default='/tmp/bench_parse')
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    os.makedirs(args.workdir)
+    for i in range(args.stations):
+        write_synthetic_station(os.path.join(args.workdir, f'{i:011d}.csv'), f'{i:011d}', seed=i)
+    pattern = os.path.join(args.workdir, '*.csv')
+    paths = sorted(glob.glob(pattern))
+    with open(paths[0]) as f:
+        header = f.readline().strip().split('","')
+
+    n_rows, legacy, current = time_plain(paths)
+    print(f"{n_rows} rows")
+    print(f"plain Python   legacy split   {legacy:12,.0f} rows/s  {1e6 / legacy:6.2f} us/row")
+    print(f"plain Python   ReadLCDRows    {current:12,.0f} rows/s  {1e6 / current:6.2f} us/row")
+
+    legacy_time = time_pipeline(pattern, lambda p: (
+        p
+        | beam.io.ReadFromText(pattern)
+        | beam.Map(legacy_parse, header, REQUIRED_FIELDS)
+        | beam.Filter(lambda row: row is not None)))
+    current_time = time_pipeline(pattern, lambda p: p | ReadLCD(pattern, REQUIRED_FIELDS))
+    print(f"DirectRunner   legacy split   {n_rows / legacy_time:12,.0f} rows/s")
+    print(f"DirectRunner   ReadLCD        {n_rows / current_time:12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
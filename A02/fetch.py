@@ -0,0 +1,86 @@
+"""Concurrent download of NCEI data files straight into a zip archive.
+
+Kept free of Airflow imports so it can be exercised against a local server;
+saic.py uses it for the Fetch_NCEI_Data DAG.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+import urllib.parse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 256 * 1024
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Responses stay in memory up to this size and only spill to a temporary file beyond it
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+
+def create_session(pool_size):
+    """Create a session whose connection pool can serve `pool_size` concurrent downloads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_file(session, url, retries=3, backoff=0.5, timeout=60):
+    """Stream one file into a spooled buffer, retrying transient failures with exponential backoff.
+
+    Returns the buffer rewound to the start.
+    """
+    for attempt in range(retries + 1):
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    buffer.write(chunk)
+            buffer.seek(0)
+            return buffer
+        except requests.RequestException as error:
+            buffer.close()
+            retryable = error.response is None or error.response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_to_archive(file_urls, archive_path, workers=8, retries=3, backoff=0.5):
+    """Download `file_urls` concurrently and add each one to a zip at `archive_path` as it completes.
+
+    At most `workers` downloads run at once. The main thread is the only
+    writer to the archive, which is built under a temporary name and moved
+    into place once complete. Returns the names of the archived files.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+    partial_path = f"{archive_path}.part"
+    archived = []
+    session = create_session(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        futures = {executor.submit(fetch_file, session, url, retries, backoff): url for url in file_urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            file_name = urllib.parse.unquote(os.path.basename(url))
+            try:
+                buffer = future.result()
+            except requests.RequestException as error:
+                logging.error("Failed to download %s: %s", url, error)
+                continue
+            with buffer, archive.open(file_name, 'w', force_zip64=True) as entry:
+                shutil.copyfileobj(buffer, entry, CHUNK_SIZE)
+            archived.append(file_name)
+    if file_urls and not archived:
+        os.remove(partial_path)
+        raise RuntimeError("None of the selected files could be downloaded")
+    os.replace(partial_path, archive_path)
+    return archived
@@ -3,11 +3,11 @@ from airflow.operators.bash import BashOperator
 from airflow.operators.python import PythonOperator
 from airflow.models.param import Param
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+import csv
 import os
 import random
-import urllib
 import shutil
+import sys
 
 
 from airflow.sensors.filesystem import FileSensor
@@ -18,17 +18,24 @@ from geodatasets import get_path
 import matplotlib.pyplot as plt
 import numpy as np
 import logging
-from ast import literal_eval as make_tuple
+import glob
 import shutil
 import os
 
+from beam_transforms import ComputeMonthlyAverages, ProcessCSV, ReadLCD, averages_schema
+from fetch import fetch_to_archive
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ncei_common.listing import file_names, load_listing, read_cached_listing
+
 # Constants
 BASE_URL = 'https://www.ncei.noaa.gov/data/local-climatological-data/access/'
 YEAR = 2002
 NUM_FILES = 2
+FETCH_WORKERS = 8
 ARCHIVE_OUTPUT_DIR = '/tmp/archives'
-DATA_FILE_OUTPUT_DIR = f'/tmp/data/{YEAR}/'
-HTML_FILE_SAVE_DIR = '/tmp/html/'
+LISTING_CACHE_DIR = '/tmp/ncei_listing/'
+LISTING_TTL_SECONDS = 24 * 60 * 60
 
 # Default DAG configuration
 default_args = {
@@ -50,25 +57,30 @@ dag1 = DAG(
     },
 )
 
-# Task 1: Download HTML page containing data links for the specified year
-fetch_page_task = BashOperator(
-    task_id="Download_HTML_data",
-    bash_command="curl {{params.base_url}}{{params.year}}/ --create-dirs -o {{params.file_save_dir}}{{params.year}}.html",
-    params={
+# Task 1: Refresh the cached file listing for the specified year; the year page
+# is only requested once the cached listing is older than its TTL, and then
+# conditionally, so an unchanged page is not downloaded or parsed again
+def refresh_listing(base_url, year, cache_dir, **kwargs):
+    """Refreshes the cached listing of the year's data files."""
+    listing = load_listing(year, base_url, cache_dir, LISTING_TTL_SECONDS)
+    logging.info("%d files listed for %s", len(listing['files']), year)
+
+fetch_page_task = PythonOperator(
+    task_id="Refresh_file_listing",
+    python_callable=refresh_listing,
+    op_kwargs={
         'base_url': "{{ dag_run.conf.get('base_url', params.base_url) }}",
-        'file_save_dir': HTML_FILE_SAVE_DIR,
+        'year': "{{ dag_run.conf.get('year', params.year) }}",
+        'cache_dir': LISTING_CACHE_DIR,
     },
     dag=dag1,
 )
 
-# Task 2: Select random data files from the available list of files
-def select_random_files(num_files, base_url, year, file_save_dir, **kwargs):
+# Task 2: Select random data files from the cached listing
+def select_random_files(num_files, base_url, year, cache_dir, **kwargs):
     """Selects random files from the list of available files."""
-    with open(f"{file_save_dir}{year}.html", "r") as f:
-        page_content = f.read()
-    soup = BeautifulSoup(page_content, 'html.parser')
-    file_links = [link.get('href') for link in soup.find_all('a') if ".csv" in link.get('href')]
-    selected_files = random.sample(file_links, min(int(num_files), len(file_links)))
+    available_files = file_names(read_cached_listing(year, cache_dir))
+    selected_files = random.sample(available_files, min(int(num_files), len(available_files)))
     selected_files_urls = [f"{base_url}{year}/{file}" for file in selected_files]
     return selected_files_urls
 
@@ -79,61 +91,32 @@ select_files_task = PythonOperator(
         'num_files': "{{ dag_run.conf.get('num_files', params.num_files) }}",
         'year': "{{ dag_run.conf.get('year', params.year) }}",
         'base_url': "{{ dag_run.conf.get('base_url', params.base_url) }}",
-        'file_save_dir': HTML_FILE_SAVE_DIR,
+        'cache_dir': LISTING_CACHE_DIR,
     },
     dag=dag1,
 )
 
-# Task 3: Download the selected data files
-def download_files(selected_files, csv_output_dir):
-    """Downloads the selected data files."""
-    os.makedirs(csv_output_dir, exist_ok=True)
-    for file_url in selected_files:
-        file_name = urllib.parse.unquote(os.path.basename(file_url))
-        file_path = os.path.join(csv_output_dir, file_name)
-        os.system(f"curl {file_url} -o {file_path}")
+# Task 3: Download the selected data files concurrently, writing each one
+# straight into the archive at its final location (no separate zip/move pass)
+def download_files(archive_output_dir, year, ti, **kwargs):
+    """Downloads the selected data files into the year's archive."""
+    selected_files = ti.xcom_pull(task_ids='select_files')
+    archive_path = os.path.join(archive_output_dir, f"{year}.zip")
+    archived = fetch_to_archive(selected_files, archive_path, workers=FETCH_WORKERS)
+    logging.info("Archived %d of %d files into %s", len(archived), len(selected_files), archive_path)
 
 fetch_files_task = PythonOperator(
     task_id='fetch_files',
     python_callable=download_files,
-    provide_context=True,
-    op_kwargs={'csv_output_dir': DATA_FILE_OUTPUT_DIR},
-    dag=dag1,
-)
-
-# Task 4: Zip the downloaded data files into an archive
-def zip_files(output_dir, archive_path):
-    """Zips the downloaded data files into an archive."""
-    shutil.make_archive(archive_path, 'zip', output_dir)
-
-zip_files_task = PythonOperator(
-    task_id='zip_files',
-    python_callable=zip_files,
     op_kwargs={
-        'output_dir': DATA_FILE_OUTPUT_DIR,
-        'archive_path': DATA_FILE_OUTPUT_DIR.rstrip('/'),
-    },
-    dag=dag1,
-)
-
-# Task 5: Move the archive to the specified location
-def move_archive(archive_path, target_location):
-    """Moves the archive to the specified location."""
-    os.makedirs(target_location, exist_ok=True)
-    shutil.move(f"{archive_path}.zip", os.path.join(target_location, f"{YEAR}.zip"))
-
-move_archive_task = PythonOperator(
-    task_id='move_archive',
-    python_callable=move_archive,
-    op_kwargs={
-        'target_location': "{{ dag_run.conf.get('archive_output_dir', params.archive_output_dir) }}",
-        'archive_path': DATA_FILE_OUTPUT_DIR.rstrip('/'),
+        'archive_output_dir': "{{ dag_run.conf.get('archive_output_dir', params.archive_output_dir) }}",
+        'year': "{{ dag_run.conf.get('year', params.year) }}",
     },
     dag=dag1,
 )
 
 # Task dependencies
-fetch_page_task >> select_files_task >> fetch_files_task >> zip_files_task >> move_archive_task
+fetch_page_task >> select_files_task >> fetch_files_task
 
 # Constants
 ARCHIVE_PATH = "/tmp/archives/2002.zip"
@@ -177,20 +160,22 @@ unzip_task = BashOperator(
     dag=dag2,
 )
 
-# Task 2.3: Process CSV using Apache Beam
+# Task 2.3: Process CSV and compute monthly averages using Apache Beam
+# Both outputs branch off a single read of the CSV files, and the monthly
+# means are combined per key (sum/count) instead of grouping raw values.
 def process_csv(required_fields, **kwargs):
     required_fields = [field.strip() for field in required_fields.split(",")]
     os.makedirs('/tmp/results', exist_ok=True)
+    # Drop the shards of earlier runs so the heatmaps only see this run's output
+    for shard in glob.glob('/tmp/results/averages-*.parquet') + glob.glob('/tmp/results/result.txt-*'):
+        os.remove(shard)
     with beam.Pipeline(runner='DirectRunner') as p:
-        result = (
-            p
-            | 'ReadCSV' >> beam.io.ReadFromText('/tmp/data2/*.csv')
-            | 'ParseData' >> beam.Map(lambda data: data.split('","'))
-            | 'FilterAndCreateTuple' >> beam.ParDo(ExtractAndFilterFields(required_fields=required_fields))
-            | 'CombineTuple' >> beam.GroupByKey()
-            | 'UnpackTuple' >> beam.Map(lambda a: (a[0][0], a[0][1], a[1]))
-        )
+        rows = p | 'ReadCSV' >> ReadLCD('/tmp/data2/*.csv', required_fields)
+        result = rows | 'ProcessCSV' >> ProcessCSV()
         result | 'WriteToText' >> beam.io.WriteToText('/tmp/results/result.txt')
+        averages = rows | 'ComputeMonthlyAverages' >> ComputeMonthlyAverages(required_fields)
+        averages | 'WriteAveragesToParquet' >> beam.io.WriteToParquet(
+            '/tmp/results/averages', averages_schema(required_fields), file_name_suffix='.parquet')
 
 process_csv_files_task = PythonOperator(
     task_id='process_csv_files',
@@ -199,42 +184,42 @@ process_csv_files_task = PythonOperator(
     dag=dag2,
 )
 
-# Task 2.4: Compute monthly averages using Apache Beam
-def compute_monthly_avg(required_fields, **kwargs):
-    required_fields = [field.strip() for field in required_fields.split(",")]
-    os.makedirs('/tmp/results', exist_ok=True)
-    with beam.Pipeline(runner='DirectRunner') as p:
-        result = (
-            p
-            | 'ReadProcessedData' >> beam.io.ReadFromText('/tmp/data2/*.csv')
-            | 'ParseData' >> beam.Map(lambda data: data.split('","'))
-            | 'CreateTupleWithMonthInKey' >> beam.ParDo(ExtractFieldsWithMonth(required_fields=required_fields))
-            | 'CombineTupleMonthly' >> beam.GroupByKey()
-            | 'ComputeAverages' >> beam.Map(compute_avg)
-            | 'CombineTuplewithAverages' >> beam.GroupByKey()
-            | 'UnpackTuple' >> beam.Map(lambda a: (a[0][0], a[0][1], a[1]))
-        )
-        result | 'WriteAveragesToText' >> beam.io.WriteToText('/tmp/results/averages.txt')
-
-compute_monthly_avg_task = PythonOperator(
-    task_id='compute_monthly_averages',
-    python_callable=compute_monthly_avg,
-    op_kwargs={'required_fields': "{{ params.required_fields }}"},
-    dag=dag2,
-)
+# Task 2.4: Create heatmap visualizations
+# The monthly averages are read back from the Parquet shards as typed columns,
+# so each field is plotted straight from one DataFrame.
+def data_years(file_pattern):
+    """Years covered by the LCD files, taken from the DATE of each file's first row."""
+    years = set()
+    for path in glob.glob(file_pattern):
+        with open(path, encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            row = next(reader, None)
+            if header and row and 'DATE' in header:
+                years.add(row[header.index('DATE')][:4])
+    return sorted(years)
 
-# Task 2.5: Create heatmap visualizations
 def create_heatmap_visualization(required_fields, **kwargs):
     required_fields = [field.strip() for field in required_fields.split(",")]
-    with beam.Pipeline(runner='DirectRunner') as p:
-        result = (
-            p
-            | 'ReadProcessedData' >> beam.io.ReadFromText('/tmp/results/averages.txt*')
-            | 'PreprocessParse' >> beam.Map(lambda a: make_tuple(a.replace('nan', 'None')))
-            | 'GlobalAggregation' >> beam.CombineGlobally(Aggregated(required_fields=required_fields))
-            | 'FlatMap' >> beam.FlatMap(lambda a: a)
-            | 'PlotGeomaps' >> beam.Map(plot_geomaps)
-        )
+    years = data_years('/tmp/data2/*.csv')
+    period = '-'.join(dict.fromkeys([years[0], years[-1]])) if years else 'unknown year'
+    shards = sorted(glob.glob('/tmp/results/averages-*.parquet'))
+    averages = pd.concat([pd.read_parquet(shard) for shard in shards], ignore_index=True)
+    station_means = averages.groupby(['latitude', 'longitude'], as_index=False)[required_fields].mean()
+    stations = gpd.GeoDataFrame(
+        station_means,
+        geometry=gpd.points_from_xy(station_means['longitude'], station_means['latitude']),
+        crs='EPSG:4326',
+    )
+    world = gpd.read_file(get_path('naturalearth.land'))
+    os.makedirs('/tmp/results/heatmaps', exist_ok=True)
+    for field in required_fields:
+        fig, ax = plt.subplots(figsize=(12, 6))
+        world.plot(ax=ax, color='lightgrey')
+        stations.plot(ax=ax, column=field, cmap='coolwarm', legend=True, markersize=40)
+        ax.set_title(f'Average {field} ({period})')
+        fig.savefig(f'/tmp/results/heatmaps/{field}.png')
+        plt.close(fig)
 
 create_heatmap_task = PythonOperator(
     task_id='create_heatmap_visualization',
@@ -243,7 +228,7 @@ create_heatmap_task = PythonOperator(
     dag=dag2,
 )
 
-# Task 2.6: Delete CSV files after processing
+# Task 2.5: Delete CSV files after processing
 delete_csv_task = PythonOperator(
     task_id='delete_csv_file',
     python_callable=lambda: shutil.rmtree('/tmp/data2'),
@@ -251,5 +236,4 @@ delete_csv_task = PythonOperator(
 )
 
 # Task dependencies
-wait_task >> unzip_task >> process_csv_files_task >> delete_csv_task
-unzip_task >> compute_monthly_avg_task >> create_heatmap_task >> delete_csv_task
\ No newline at end of file
+wait_task >> unzip_task >> process_csv_files_task >> create_heatmap_task >> delete_csv_task
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""Benchmark download.py against a local stand-in for the NCEI server.
+
+Serves synthetic station CSVs from a threaded HTTP server with per-request
+latency, then times a serial download (1 worker) against a concurrent one,
+checks that a second run skips everything and that an interrupted file resumes.
+
+Usage: python bench_download.py [--stations 300] [--size-kb 200] [--latency-ms 50] [--workers 16]
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from download import download_files
+
+
+def make_handler(root, latency):
+    class Handler(SimpleHTTPRequestHandler):
+        # http.server has no Range support, so add enough of it to exercise resume
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=root, **kwargs)
+
+        def log_message(self, *args):
+            pass
+
+        def end_headers(self):
+            path = self.translate_path(self.path)
+            if os.path.isfile(path):
+                self.send_header('ETag', '"%s"' % hashlib.md5(path.encode()).hexdigest())
+                self.send_header('Accept-Ranges', 'bytes')
+            super().end_headers()
+
+        def do_GET(self):
+            time.sleep(latency)
+            path = self.translate_path(self.path)
+            range_header = self.headers.get('Range')
+            if not range_header or not os.path.isfile(path):
+                return super().do_GET()
+            start = int(range_header.split('=')[1].split('-')[0])
+            with open(path, 'rb') as f:
+                f.seek(start)
+                body = f.read()
+            self.send_response(206)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class StandInServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under concurrent load
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_stations(root, year, stations, size_kb):
+    os.makedirs(os.path.join(root, year))
+    row = b'"01001099999","2020-01-01T00:20:00","FM-15","7","0.12",' + b'"x",' * 20 + b'"1"\n'
+    body = row * (size_kb * 1024 // len(row))
+    names = [f"{i:011d}.csv" for i in range(stations)]
+    for name in names:
+        with open(os.path.join(root, year, name), 'wb') as f:
+            f.write(body)
+    return names
+
+
+def timed_download(names, base_url, workdir, workers):
+    save_dir = os.path.join(workdir, 'data')
+    os.makedirs(save_dir, exist_ok=True)
+    start = time.perf_counter()
+    download_files('2020', names, base_url, save_dir, workers,
+                   partial_dir=os.path.join(workdir, 'data_partial'),
+                   manifest_path=os.path.join(workdir, 'manifest.json'))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=300)
+    parser.add_argument('--size-kb', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        names = make_stations(os.path.join(root, 'server'), '2020', args.stations, args.size_kb)
+        server = StandInServer(('127.0.0.1', 0), make_handler(os.path.join(root, 'server'), args.latency_ms / 1000))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        serial = timed_download(names, base_url, os.path.join(root, 'serial'), 1)
+        concurrent_dir = os.path.join(root, 'concurrent')
+        concurrent = timed_download(names, base_url, concurrent_dir, args.workers)
+        rerun = timed_download(names, base_url, concurrent_dir, args.workers)
+
+        # Simulate an interrupted download: truncate into the partial directory and resume
+        victim = names[0]
+        with open(os.path.join(concurrent_dir, 'data', victim), 'rb') as f:
+            expected = f.read()
+        os.remove(os.path.join(concurrent_dir, 'data', victim))
+        with open(os.path.join(concurrent_dir, 'data_partial', victim), 'wb') as f:
+            f.write(expected[:len(expected) // 3])
+        timed_download([victim], base_url, concurrent_dir, 1)
+        with open(os.path.join(concurrent_dir, 'data', victim), 'rb') as f:
+            assert f.read() == expected, "resumed file does not match"
+
+        server.shutdown()
+        print(f"\n{args.stations} stations x {args.size_kb} KB, {args.latency_ms:.0f} ms latency")
+        print(f"  serial (1 worker):      {serial:7.2f}s")
+        print(f"  concurrent ({args.workers} workers): {concurrent:7.2f}s  ({serial / concurrent:.1f}x)")
+        print(f"  re-run, all up to date: {rerun:7.2f}s")
+        print("  resume of a partial file: ok")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compare the streaming R2 evaluator with loading both files and calling sklearn.
+
+Writes a large synthetic ground truth / prediction pair, checks that every
+column's R2 matches sklearn's r2_score to 1e-9 and reports wall time and peak
+RSS of each approach, each in a fresh process.
+
+Usage: python bench_evaluate.py [--rows 5000000] [--columns 10]
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import r2_score
+
+from bench_ingest import measure
+from streaming_r2 import streaming_r2_scores
+
+
+def in_memory_r2(ground_truth_path, computed_path):
+    """The previous evaluator: both files fully in pandas, sklearn per column."""
+    df_ground_truth = pd.read_parquet(ground_truth_path)
+    df_computed_avg = pd.read_parquet(computed_path)
+    return {col: r2_score(df_ground_truth[col], df_computed_avg[col])
+            for col in df_computed_avg.columns if col in df_ground_truth.columns}
+
+
+def write_pair(directory, rows, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    truth = {f'col{i}': rng.normal(1000 * i, 10, rows) for i in range(columns)}
+    computed = {col: values + rng.normal(0, 3, rows) for col, values in truth.items()}
+    paths = os.path.join(directory, 'truth.parquet'), os.path.join(directory, 'computed.parquet')
+    pd.DataFrame(truth).to_parquet(paths[0], row_group_size=250000)
+    pd.DataFrame(computed).to_parquet(paths[1], row_group_size=400000)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--columns', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = write_pair(workdir, args.rows, args.columns)
+        expected = in_memory_r2(*paths)
+        actual = streaming_r2_scores(*paths)
+        worst = max(abs(actual[col] - expected[col]) for col in expected)
+        assert worst <= 1e-9, f"streaming R2 differs from sklearn by {worst}"
+
+        print(f"{args.rows} rows x {args.columns} columns, max |R2 - sklearn| = {worst:.1e}")
+        for name, fn in (('sklearn', in_memory_r2), ('streaming', streaming_r2_scores)):
+            elapsed, peak, growth = measure(fn, *paths)
+            print(f"  {name:>9}: {elapsed:6.2f}s, peak RSS {peak:7.1f} MB (+{growth:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Compare the old CSV-based prepare/process/evaluate ingestion with the Parquet one.
+
+Generates a synthetic LCD station file with the real column layout (hourly,
+daily and monthly summary rows, flagged values such as "0.12s", "T" and "M"),
+then reports wall time and peak RSS for each approach, each run in a fresh
+process so the peaks do not mask one another.
+
+Usage: python bench_ingest.py [--years 3] [--stations 3]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from lcd import read_lcd_columns
+from prepare import clean_and_calculate_means, extract_columns
+
+HOURLY = ['HourlyAltimeterSetting', 'HourlyDewPointTemperature', 'HourlyDryBulbTemperature',
+          'HourlyPrecipitation', 'HourlyPresentWeatherType', 'HourlyPressureChange',
+          'HourlyPressureTendency', 'HourlyRelativeHumidity', 'HourlySkyConditions',
+          'HourlySeaLevelPressure', 'HourlyStationPressure', 'HourlyVisibility',
+          'HourlyWetBulbTemperature', 'HourlyWindDirection', 'HourlyWindGustSpeed', 'HourlyWindSpeed']
+DAILY = ['DailyAverageDewPointTemperature', 'DailyAverageDryBulbTemperature',
+         'DailyAverageRelativeHumidity', 'DailyAverageSeaLevelPressure', 'DailyAverageStationPressure',
+         'DailyAverageWetBulbTemperature', 'DailyAverageWindSpeed', 'DailyCoolingDegreeDays',
+         'DailyDepartureFromNormalAverageTemperature', 'DailyHeatingDegreeDays',
+         'DailyMaximumDryBulbTemperature', 'DailyMinimumDryBulbTemperature', 'DailyPeakWindDirection',
+         'DailyPeakWindSpeed', 'DailyPrecipitation', 'DailySnowDepth', 'DailySnowfall',
+         'DailySustainedWindDirection', 'DailySustainedWindSpeed', 'DailyWeather']
+MONTHLY = ['MonthlyAverageRH', 'MonthlyDaysWithGT001Precip', 'MonthlyDaysWithGT010Precip',
+           'MonthlyDaysWithGT32Temp', 'MonthlyDaysWithGT90Temp', 'MonthlyDaysWithLT0Temp',
+           'MonthlyDaysWithLT32Temp', 'MonthlyDepartureFromNormalAverageTemperature',
+           'MonthlyDepartureFromNormalCoolingDegreeDays', 'MonthlyDepartureFromNormalHeatingDegreeDays',
+           'MonthlyDepartureFromNormalMaximumTemperature', 'MonthlyDepartureFromNormalMinimumTemperature',
+           'MonthlyDepartureFromNormalPrecipitation', 'MonthlyDewpointTemperature',
+           'MonthlyGreatestPrecip', 'MonthlyGreatestSnowDepth', 'MonthlyGreatestSnowfall',
+           'MonthlyMaxSeaLevelPressureValue', 'MonthlyMaximumTemperature', 'MonthlyMeanTemperature',
+           'MonthlyMinSeaLevelPressureValue', 'MonthlyMinimumTemperature', 'MonthlySeaLevelPressure',
+           'MonthlyStationPressure', 'MonthlyTotalLiquidPrecipitation', 'MonthlyTotalSnowfall',
+           'MonthlyWetBulb']
+OTHER = ['STATION', 'DATE', 'LATITUDE', 'LONGITUDE', 'ELEVATION', 'NAME', 'REPORT_TYPE', 'SOURCE']
+
+
+def flagged_values(rng, n):
+    """Numbers as strings, a few carrying LCD flags, trace or missing markers."""
+    values = np.round(rng.normal(20, 10, n), 2).astype(str).astype(object)
+    roll = rng.random(n)
+    values[roll < 0.05] = 'M'
+    values[(roll >= 0.05) & (roll < 0.08)] = 'T'
+    flagged = (roll >= 0.08) & (roll < 0.12)
+    values[flagged] = [f"{v}s" for v in values[flagged]]
+    return values
+
+
+def write_synthetic_station(path, years=3, seed=0):
+    """Write an LCD-shaped CSV: hourly rows, plus daily and monthly summary rows."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range('2018-01-01', periods=years * 365 * 24, freq='h')
+    days = pd.date_range('2018-01-01', periods=years * 365, freq='D') + pd.Timedelta(hours=23, minutes=59)
+    months = pd.date_range('2018-01-31', periods=years * 12, freq='ME') + pd.Timedelta(hours=23, minutes=59)
+    frames = []
+    for dates, report_type, columns in ((hours, 'FM-15', HOURLY), (days, 'SOD  ', DAILY), (months, 'SOM  ', MONTHLY)):
+        frame = pd.DataFrame({col: flagged_values(rng, len(dates)) for col in columns})
+        frame['DATE'] = dates.strftime('%Y-%m-%dT%H:%M:%S')
+        frame['REPORT_TYPE'] = report_type
+        frames.append(frame)
+    df = pd.concat(frames).sort_values('DATE')
+    df['STATION'], df['LATITUDE'], df['LONGITUDE'] = '01001099999', 70.93, -8.67
+    df['ELEVATION'], df['NAME'], df['SOURCE'] = 9.0, 'JAN MAYEN NOR NAVY, NO', '4'
+    df[OTHER + HOURLY + DAILY + MONTHLY].to_csv(path, index=False, quoting=1)
+
+
+def csv_pipeline(file_path, out_dir):
+    """The previous stages: full object-dtype parse, CSV intermediate, re-parse per stage."""
+    df = pd.read_csv(file_path, low_memory=False)
+    columns = [col for col in df.columns if col.startswith(('Monthly', 'Daily'))] + ['DATE']
+    data = df[columns].copy()
+    data['MONTH'] = data['DATE'].apply(lambda x: x[5:7])
+    data.drop('DATE', axis=1).to_csv(os.path.join(out_dir, 'monthly.csv'), index=False)
+    pd.read_csv(os.path.join(out_dir, 'monthly.csv'), low_memory=False)  # process.py
+    pd.read_csv(os.path.join(out_dir, 'monthly.csv'), low_memory=False)  # evaluate.py
+
+
+def parquet_pipeline(file_path, out_dir):
+    """The current stages: projected, typed single pass and Parquet intermediates."""
+    station_data = read_lcd_columns(file_path)
+    monthly_data = clean_and_calculate_means(extract_columns(station_data, 'Monthly'))
+    monthly_data.to_parquet(os.path.join(out_dir, 'monthly.parquet'), index=False)
+    extract_columns(station_data, 'Daily').to_parquet(os.path.join(out_dir, 'daily.parquet'), index=False)
+    pd.read_parquet(os.path.join(out_dir, 'daily.parquet'))    # process.py
+    pd.read_parquet(os.path.join(out_dir, 'monthly.parquet'))  # evaluate.py
+
+
+def peak_rss_mb():
+    """Peak RSS of this process in MB (VmHWM on Linux, ru_maxrss elsewhere)."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Reset VmHWM so the peak inherited from the parent at fork time is not counted."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def timed_run(fn, *args):
+    reset_peak_rss()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return elapsed, peak, peak - baseline
+
+
+def measure(fn, *args):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(timed_run, fn, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--stations', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'station':>8} {'approach':>8} {'seconds':>8} {'peak RSS MB':>12} {'growth MB':>10}")
+        for station in range(args.stations):
+            file_path = os.path.join(workdir, f'station_{station}.csv')
+            write_synthetic_station(file_path, args.years, seed=station)
+            for name, fn in (('csv', csv_pipeline), ('parquet', parquet_pipeline)):
+                elapsed, peak, growth = measure(fn, file_path, workdir)
+                print(f"{station:>8} {name:>8} {elapsed:>8.2f} {peak:>12.1f} {growth:>10.1f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the vectorized monthly averages against the previous per-column loop.
+
+Builds a multi-year synthetic LCD station file, checks that both versions
+produce identical output and reports the time each takes.
+
+Usage: python bench_process.py [--years 10] [--repeats 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import pandas as pd
+
+from bench_ingest import write_synthetic_station
+from lcd import read_lcd_columns
+from prepare import extract_columns
+from process import compute_monthly_averages
+
+
+def per_column_loop(day_data):
+    """The previous process_monthly_data: one groupby, map and drop per column."""
+    for col in day_data.columns:
+        if col != "MONTH":
+            monthly_avg = day_data.groupby('MONTH')[col].mean()
+            day_data[f'Month_Avg_{col}'] = day_data['MONTH'].map(monthly_avg)
+            day_data.drop(col, axis=1, inplace=True)
+    return day_data
+
+
+def best_time(fn, day_data, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        data = day_data.copy()
+        start = time.perf_counter()
+        result = fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        file_path = os.path.join(workdir, 'station.csv')
+        write_synthetic_station(file_path, args.years)
+        day_data = extract_columns(read_lcd_columns(file_path), 'Daily')
+    day_data.dropna(axis=1, how='all', inplace=True)
+
+    warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+    loop_time, expected = best_time(per_column_loop, day_data, args.repeats)
+    vectorized_time, result = best_time(compute_monthly_averages, day_data, args.repeats)
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+    print(f"{len(day_data)} rows x {day_data.shape[1] - 1} daily columns, {args.years} years")
+    print(f"  per-column loop: {loop_time * 1000:8.1f} ms")
+    print(f"  vectorized:      {vectorized_time * 1000:8.1f} ms  ({loop_time / vectorized_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
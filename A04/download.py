@@ -1,6 +1,21 @@
-import yaml
+import json
 import os
+import sys
+import time
+import yaml
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ncei_common.listing import load_listing, unknown_files
+
+CHUNK_SIZE = 256 * 1024
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Partial downloads live outside the data directory so later stages never see them
+PARTIAL_DIRECTORY = 'data_partial'
+MANIFEST_PATH = 'download_manifest.json'
 
 def load_yaml(file_path):
     """Load data from a YAML file."""
@@ -12,29 +27,164 @@ def ensure_directory_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def download_file(url, file_path):
-    """Download a file from a specified URL and save it to a local path."""
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(file_path, 'wb') as file:
-            file.write(response.content)
-    else:
-        print(f"Failed to download file from {url}. Status code: {response.status_code}")
-
-def download_files(year, file_names, base_url, save_dir):
-    """Download multiple files based on a list of file names and a base URL."""
-    for file_name in file_names:
-        url = f"{base_url}/{year}/{file_name}"
-        file_path = os.path.join(save_dir, file_name)
-        download_file(url, file_path)
+def load_manifest(manifest_path):
+    """Load the size/ETag recorded for each previously downloaded file."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+def save_manifest(manifest, manifest_path):
+    """Save the size/ETag of each downloaded file."""
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+def create_session(pool_size):
+    """Create a session whose connection pool can serve `pool_size` concurrent downloads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_remote_info(session, url):
+    """Fetch the size and validators (ETag / Last-Modified) of a remote file with a HEAD request."""
+    try:
+        response = session.head(url, allow_redirects=True, timeout=30)
+    except requests.RequestException:
+        return {}
+    if response.status_code != 200:
+        return {}
+    size = response.headers.get('Content-Length')
+    return {
+        'size': int(size) if size is not None else None,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+def is_up_to_date(file_path, remote, known):
+    """Check whether the local file matches the remote size and the ETag it was downloaded with."""
+    if not os.path.exists(file_path) or not remote:
+        return False
+    local_size = os.path.getsize(file_path)
+    if remote['size'] is not None and remote['size'] != local_size:
+        return False
+    if remote['etag'] and known.get('etag') and remote['etag'] != known['etag']:
+        return False
+    return remote['size'] is not None or known.get('size') == local_size
+
+def stream_to_file(session, url, partial_path, validator=None, transferred=None):
+    """Stream `url` into `partial_path`, resuming from its current size with an HTTP Range request.
+
+    Bytes actually received are added to `transferred[0]` as they arrive, so
+    attempts that fail part-way still count.
+    """
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    headers = {}
+    if offset and validator:
+        headers['Range'] = f'bytes={offset}-'
+        headers['If-Range'] = validator
+
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code == 416:
+            # The partial file already holds the whole body
+            return
+        if response.status_code in RETRY_STATUS_CODES:
+            raise requests.HTTPError(f"Retryable status {response.status_code}", response=response)
+        if response.status_code not in (200, 206):
+            raise ValueError(f"Failed to download file from {url}. Status code: {response.status_code}")
+
+        mode = 'ab' if response.status_code == 206 else 'wb'
+        with open(partial_path, mode) as file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                file.write(chunk)
+                if transferred is not None:
+                    transferred[0] += len(chunk)
+
+def download_file(session, url, file_path, partial_path, known=None, retries=5, backoff=0.5):
+    """Download one file unless it is already current, retrying with exponential backoff.
+
+    Returns the file's manifest entry (None if the download failed) and the number
+    of bytes transferred, which on a resumed download is only the missing tail.
+    """
+    known = known or {}
+    remote = fetch_remote_info(session, url)
+    if is_up_to_date(file_path, remote, known):
+        return {'size': os.path.getsize(file_path), 'etag': remote['etag'] or known.get('etag')}, 0
+
+    # Only resume a partial file while the remote file is unchanged
+    validator = remote.get('etag') or remote.get('last_modified')
+    transferred = [0]
+    for attempt in range(retries + 1):
+        try:
+            stream_to_file(session, url, partial_path, validator, transferred)
+            os.replace(partial_path, file_path)
+            return {'size': os.path.getsize(file_path), 'etag': remote.get('etag')}, transferred[0]
+        except ValueError as error:
+            print(error)
+            return None, transferred[0]
+        except (requests.RequestException, OSError) as error:
+            if attempt == retries:
+                print(f"Failed to download file from {url} after {retries + 1} attempts: {error}")
+                return None, transferred[0]
+            time.sleep(backoff * 2 ** attempt)
+
+def validate_file_names(year, file_names, base_url):
+    """Raise if any requested file is missing from the year's (cached) NCEI listing."""
+    try:
+        listing = load_listing(year, base_url)
+    except requests.RequestException as error:
+        print(f"Could not fetch the {year} listing, skipping n_locs validation: {error}")
+        return
+    if not listing['files']:
+        # A layout change or an error page parses to nothing; that says nothing about n_locs
+        print(f"Warning: the {year} listing has no files, skipping n_locs validation")
+        return
+    unknown = unknown_files(file_names, listing)
+    if unknown:
+        raise ValueError(f"n_locs entries not listed for {year}: {', '.join(unknown)}")
+
+def download_files(year, file_names, base_url, save_dir, workers=8,
+                   partial_dir=PARTIAL_DIRECTORY, manifest_path=MANIFEST_PATH):
+    """Download multiple files concurrently based on a list of file names and a base URL."""
+    ensure_directory_exists(partial_dir)
+    manifest = load_manifest(manifest_path)
+    session = create_session(workers)
+    downloaded_bytes = 0
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                download_file, session,
+                f"{base_url}/{year}/{file_name}",
+                os.path.join(save_dir, file_name),
+                os.path.join(partial_dir, file_name),
+                manifest.get(file_name),
+            ): file_name
+            for file_name in file_names
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            entry, transferred = future.result()
+            downloaded_bytes += transferred
+            if entry is not None:
+                manifest[file_name] = entry
+
+    save_manifest(manifest, manifest_path)
+    elapsed = time.perf_counter() - start_time
+    print(f"Downloaded {downloaded_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({downloaded_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s) with {workers} workers")
+    return manifest
 
 def main():
     # Load the YAML configuration file
     data = load_yaml('params.yaml')
 
-    # Retrieve year and file names
+    # Retrieve year, file names and download concurrency
     year = data['year']
     file_names = data['n_locs']
+    workers = data.get('download_workers', 8)
 
     # Set the directory for saving data and ensure it exists
     data_directory = 'data'
@@ -43,8 +193,11 @@ def main():
     # Define the base URL for file downloads
     base_url = 'https://www.ncei.noaa.gov/data/local-climatological-data/access'
 
+    # Catch typos in n_locs up front instead of as failed downloads
+    validate_file_names(year, file_names, base_url)
+
     # Download all specified files
-    download_files(year, file_names, base_url, data_directory)
+    download_files(year, file_names, base_url, data_directory, workers)
 
     print("Files downloaded successfully!")
 
@@ -1,48 +1,63 @@
+import csv
+import json
 import os
-import pandas as pd
-from sklearn.metrics import r2_score
-
-def load_data(file_path):
-    """Load a CSV file into a pandas DataFrame."""
-    return pd.read_csv(file_path, low_memory=False)
-
-def calculate_r2_scores(df_ground_truth, df_computed_avg):
-    """Calculate the R2 scores for matching columns in ground truth and computed averages dataframes."""
-    results = {}
-    for column in df_computed_avg.columns:
-        if column in df_ground_truth.columns:
-            r2 = r2_score(df_ground_truth[column], df_computed_avg[column])
-            results[column] = [r2, r2 > 0.9]
-    return results
-
-def save_results(results, file_path):
-    """Save the R2 scores to a text file."""
-    with open(file_path, 'w') as file:
-        file.write(str(results))
+from station_cache import StationCache, load_stage_params
+from stations import list_station_files, load_workers
+from streaming_r2 import streaming_r2_scores
+
+R2_THRESHOLD = 0.9
+
+def calculate_r2_scores(gt_file_path, avg_file_path):
+    """Calculate the R2 scores for matching columns of the ground truth and computed averages files.
+
+    Both files are streamed in aligned chunks, so memory stays bounded by the
+    number of columns rather than the number of rows.
+    """
+    return {
+        column: {'r2': r2, 'passed': bool(r2 > R2_THRESHOLD)}
+        for column, r2 in streaming_r2_scores(gt_file_path, avg_file_path).items()
+    }
+
+def save_results(results, json_path, csv_path):
+    """Save the R2 scores per station and column as JSON and as CSV."""
+    with open(json_path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['station', 'column', 'r2', 'passed'])
+        for station, columns in sorted(results.items()):
+            for column, score in sorted(columns.items()):
+                writer.writerow([station, column, score['r2'], score['passed']])
+
+def evaluate_station(file_name, ground_truth_directory, computed_directory):
+    """Calculate the R2 scores of one station."""
+    base_name, _ = os.path.splitext(file_name)
+    gt_file_path = os.path.join(ground_truth_directory, f'monthly_{base_name}.parquet')
+    avg_file_path = os.path.join(computed_directory, f'computed_avg_{base_name}.parquet')
+
+    return calculate_r2_scores(gt_file_path, avg_file_path)
 
 def main():
     data_directory = 'data'
     ground_truth_directory = 'ground_truth'
-    file_names = os.listdir(data_directory)
-
-    total_results = {}
-
-    for file_name in file_names:
-        base_name, _ = os.path.splitext(file_name)
-        gt_file_path = os.path.join(ground_truth_directory, f'monthly_{base_name}.csv')
-        avg_file_path = os.path.join(ground_truth_directory, f'computed_avg_{base_name}.csv')
-
-        df_ground_truth = load_data(gt_file_path)
-        df_computed_avg = load_data(avg_file_path)
-
-        print(df_ground_truth.shape, df_computed_avg.shape)
-        print(df_computed_avg.columns, df_ground_truth.columns)
-
-        results = calculate_r2_scores(df_ground_truth, df_computed_avg)
-        total_results.update(results)
-
-    results_file_path = os.path.join(ground_truth_directory, 'results.txt')
-    save_results(total_results, results_file_path)
+    computed_directory = 'computed'
+    file_names = list_station_files(data_directory)
+
+    # Evaluate the stations whose raw file or code changed, in parallel, and
+    # merge in file_names order
+    cache = StationCache('evaluate', ['prepare.py', 'lcd.py', 'process.py', 'evaluate.py', 'streaming_r2.py'], load_stage_params('evaluate'))
+    station_results = cache.run(
+        evaluate_station, file_names, load_workers(),
+        lambda file_name: os.path.join(data_directory, file_name), lambda file_name: [],
+        ground_truth_directory, computed_directory,
+    )
+    # Key the results by station so columns shared by stations do not collide
+    total_results = {
+        os.path.splitext(file_name)[0]: results
+        for file_name, results in zip(file_names, station_results)
+    }
+
+    save_results(total_results, 'results.json', 'results.csv')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# LCD values carry a trailing flag letter or '*' ("0.12s", "45*"); 'T' is a trace amount
+FLAGGED_NUMBER = r'^\s*(-?\d+(?:\.\d*)?|-?\.\d+)[A-Za-z*]?\s*$'
+TRACE = 'T'
+
+def is_needed_column(column):
+    """Only the DATE and the Monthly*/Daily* measurement columns are used by the pipeline."""
+    return column == 'DATE' or column.startswith(('Monthly', 'Daily'))
+
+def coerce_lcd_numeric(values):
+    """Convert a column of LCD values to float64.
+
+    Plain numbers parse directly, flagged numbers keep their value, trace
+    amounts become 0 and anything else (such as 'M' for missing) becomes NaN.
+    """
+    if values.dtype.kind in 'fiu':
+        return values.astype('float64')
+    numbers = pd.to_numeric(values, errors='coerce')
+    unparsed = numbers.isna() & values.notna()
+    if unparsed.any():
+        leftovers = values[unparsed].astype(str)
+        extracted = pd.to_numeric(leftovers.str.extract(FLAGGED_NUMBER, expand=False), errors='coerce')
+        extracted[leftovers.str.strip() == TRACE] = 0.0
+        numbers[unparsed] = extracted
+    return numbers.astype('float64')
+
+def read_lcd_columns(file_path):
+    """Read an LCD station file in one pass, keeping only DATE and the measurement columns.
+
+    Measurement columns are read as strings (no per-chunk type inference) and
+    coerced to float64, and DATE is reduced to an integer MONTH column.
+    """
+    df = pd.read_csv(
+        file_path,
+        usecols=is_needed_column,
+        dtype=str,
+        engine='c',
+    )
+    data = pd.DataFrame(
+        {col: coerce_lcd_numeric(df[col]) for col in df.columns if col != 'DATE'},
+        index=df.index,
+    )
+    data['MONTH'] = df['DATE'].str.slice(5, 7).astype(np.int8)
+    return data
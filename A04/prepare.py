@@ -1,15 +1,17 @@
 import os
-import pandas as pd
+from lcd import read_lcd_columns
+from station_cache import StationCache, load_stage_params
+from stations import list_station_files, load_workers
+
+def extract_columns(station_data, prefix):
+    """Extracts the columns starting with `prefix` together with the MONTH column."""
+    columns = [col for col in station_data.columns if col.startswith(prefix)]
+    columns.append('MONTH')
+    return station_data[columns].copy()
 
 def extract_monthly_data(file_path):
     """Extracts columns that contain monthly data and appends the month extracted from the DATE column."""
-    df = pd.read_csv(file_path, low_memory=False)
-    monthly_columns = [col for col in df.columns if col.startswith('Monthly')]
-    monthly_columns.append('DATE')
-    monthly_data = df[monthly_columns]
-    monthly_data['MONTH'] = monthly_data['DATE'].apply(lambda x: x[5:7])
-    monthly_data.drop('DATE', axis=1, inplace=True)
-    return monthly_data
+    return extract_columns(read_lcd_columns(file_path), 'Monthly')
 
 def clean_and_calculate_means(monthly_data):
     """Cleans the data by dropping all-NaN columns and fills missing values with column means, excluding 'MONTH'."""
@@ -25,31 +27,52 @@ def update_common_columns(common_columns, new_columns, first_iteration):
     else:
         return common_columns.intersection(set(new_columns))
 
+def prepare_station(file_name, data_directory, ground_truth_directory):
+    """Write the monthly and daily data of one station and return its monthly columns."""
+    file_path = os.path.join(data_directory, file_name)
+
+    # Read the station file once; both the monthly ground truth and the
+    # daily data for process.py come from this single pass
+    station_data = read_lcd_columns(file_path)
+    monthly_data = clean_and_calculate_means(extract_columns(station_data, 'Monthly'))
+    daily_data = extract_columns(station_data, 'Daily')
+
+    # Save the monthly and daily data with a unique name
+    base_name, _ = os.path.splitext(file_name)
+    monthly_data.to_parquet(os.path.join(ground_truth_directory, f'monthly_{base_name}.parquet'), index=False)
+    daily_data.to_parquet(os.path.join(ground_truth_directory, f'daily_{base_name}.parquet'), index=False)
+    return list(monthly_data.columns)
+
 def main():
     data_directory = 'data'
     ground_truth_directory = 'ground_truth'
-    file_names = os.listdir(data_directory)
+    file_names = list_station_files(data_directory)
+    os.makedirs(ground_truth_directory, exist_ok=True)
 
-    common_columns = set()
-
-    for i, file_name in enumerate(file_names):
-        file_path = os.path.join(data_directory, file_name)
-        monthly_data = extract_monthly_data(file_path)
-        monthly_data = clean_and_calculate_means(monthly_data)
-
-        # Save the monthly data with a unique name
+    def output_paths(file_name):
         base_name, _ = os.path.splitext(file_name)
-        monthly_data.to_csv(os.path.join(ground_truth_directory, f'monthly_{base_name}.csv'), index=False)
+        return [os.path.join(ground_truth_directory, f'{kind}_{base_name}.parquet') for kind in ('monthly', 'daily')]
 
+    # Prepare the stations whose raw file or code changed, in parallel;
+    # results come back in file_names order
+    cache = StationCache('prepare', ['prepare.py', 'lcd.py'], load_stage_params('prepare'))
+    station_columns = cache.run(
+        prepare_station, file_names, load_workers(),
+        lambda file_name: os.path.join(data_directory, file_name), output_paths,
+        data_directory, ground_truth_directory,
+    )
+
+    common_columns = set()
+    for i, columns in enumerate(station_columns):
         # Update the common columns
-        common_columns = update_common_columns(common_columns, monthly_data.columns, i == 0)
+        common_columns = update_common_columns(common_columns, columns, i == 0)
 
     # Remove 'MONTH' from the common columns
     common_columns.discard('MONTH')
 
     # Save the common columns to a text file
     with open(os.path.join(ground_truth_directory, 'monthly_columns.txt'), 'w') as f:
-        for column in common_columns:
+        for column in sorted(common_columns):
             f.write(f"{column}\n")
 
 if __name__ == '__main__':
@@ -1,5 +1,8 @@
 import os
 import pandas as pd
+from lcd import coerce_lcd_numeric
+from station_cache import StationCache, load_stage_params
+from stations import list_station_files, load_workers
 
 def load_common_columns(file_path):
     """Load common column names from a file."""
@@ -7,45 +10,61 @@ def load_common_columns(file_path):
         columns = [line.strip() for line in file]
     return columns
 
-def process_monthly_data(file_name, data_directory, ground_truth_directory):
-    """Process the CSV file to compute monthly averages from daily data."""
-    # Construct the path to the CSV file
-    csv_path = os.path.join(ground_truth_directory, f'monthly_{os.path.splitext(file_name)[0]}.csv')
+def compute_monthly_averages(day_data):
+    """Replace every daily column with its per-MONTH mean, named Month_Avg_<column>.
 
-    # Read the CSV file
-    df = pd.read_csv(csv_path, low_memory=False)
+    All columns are averaged in a single groupby-transform. Columns that are
+    still text (flagged LCD values such as "0.12s", "T" or "M") are coerced to
+    numbers first.
+    """
+    daily_columns = [col for col in day_data.columns if col != 'MONTH']
+    values = day_data[daily_columns]
+    text_columns = [col for col in daily_columns if values[col].dtype.kind not in 'fiu']
+    if text_columns:
+        values = values.assign(**{col: coerce_lcd_numeric(values[col]) for col in text_columns})
 
-    # Identify daily data columns plus the 'MONTH' column
-    day_columns = [col for col in df.columns if col.startswith('Daily')]
-    day_columns.append('MONTH')
+    averages = values.groupby(day_data['MONTH']).transform('mean')
+    averages.columns = [f'Month_Avg_{col}' for col in daily_columns]
+    return pd.concat([day_data[['MONTH']], averages], axis=1)
 
-    # Filter the dataframe to include only the daily data and 'MONTH'
-    day_data = df[day_columns]
+def process_monthly_data(file_name, ground_truth_directory, computed_directory):
+    """Process the daily data of a station to compute monthly averages."""
+    # Construct the path to the daily data written by prepare.py
+    parquet_path = os.path.join(ground_truth_directory, f'daily_{os.path.splitext(file_name)[0]}.parquet')
+
+    # Read the daily data columns plus the 'MONTH' column
+    day_data = pd.read_parquet(parquet_path)
 
     # Drop columns where all values are NaN
     day_data.dropna(axis=1, how='all', inplace=True)
 
-    # Compute the average for each month and clean up columns
-    for col in day_data.columns:
-        if col != "MONTH":
-            monthly_avg = day_data.groupby('MONTH')[col].mean()
-            day_data[f'Month_Avg_{col}'] = day_data['MONTH'].map(monthly_avg)
-            day_data.drop(col, axis=1, inplace=True)
+    # Compute the average for each month
+    day_data = compute_monthly_averages(day_data)
 
-    # Save the processed data to a new CSV file
-    output_path = os.path.join(ground_truth_directory, f'computed_avg_{os.path.splitext(file_name)[0]}.csv')
-    day_data.to_csv(output_path, index=False)
+    # Save the processed data to a new Parquet file
+    output_path = os.path.join(computed_directory, f'computed_avg_{os.path.splitext(file_name)[0]}.parquet')
+    day_data.to_parquet(output_path, index=False)
 
 def main():
     data_directory = 'data'
     ground_truth_directory = 'ground_truth'
-    file_names = os.listdir(data_directory)
+    computed_directory = 'computed'
+    file_names = list_station_files(data_directory)
+    os.makedirs(computed_directory, exist_ok=True)
 
     # Load the common columns (not used in the current script but loaded for potential future use)
     common_columns = load_common_columns(os.path.join(ground_truth_directory, 'monthly_columns.txt'))
 
-    for file_name in file_names:
-        process_monthly_data(file_name, data_directory, ground_truth_directory)
+    def output_paths(file_name):
+        return [os.path.join(computed_directory, f'computed_avg_{os.path.splitext(file_name)[0]}.parquet')]
+
+    # Process the stations whose raw file or code changed, in parallel
+    cache = StationCache('process', ['prepare.py', 'lcd.py', 'process.py'], load_stage_params('process'))
+    cache.run(
+        process_monthly_data, file_names, load_workers(),
+        lambda file_name: os.path.join(data_directory, file_name), output_paths,
+        ground_truth_directory, computed_directory,
+    )
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import yaml
+from stations import map_stations
+
+CACHE_DIRECTORY = '.station_cache'
+READ_SIZE = 1024 * 1024
+# Params that only change how fast a stage runs, not what it writes
+EXECUTION_PARAMS = ('workers', 'download_workers')
+
+def file_digest(file_path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_stage_params(stage, params_path='params.yaml', dvc_path='dvc.yaml'):
+    """The params.yaml values that dvc.yaml lists for `stage`, minus the execution-only ones."""
+    with open(dvc_path, 'r') as file:
+        names = yaml.safe_load(file)['stages'][stage].get('params', [])
+    with open(params_path, 'r') as file:
+        values = yaml.safe_load(file)
+    return {name: values.get(name) for name in names if isinstance(name, str) and name not in EXECUTION_PARAMS}
+
+class StationCache:
+    """Remember, per station, the key its outputs were computed from.
+
+    A station's key hashes its raw CSV together with the code of every stage
+    that produced its outputs and the stage's params (see load_stage_params),
+    so outputs are only recomputed when one of those actually changed. Raw
+    file digests are reused while the file's size and mtime are unchanged.
+    """
+
+    def __init__(self, stage, code_paths, params=None, cache_directory=CACHE_DIRECTORY):
+        self.stage = stage
+        self.cache_directory = cache_directory
+        self.manifest_path = os.path.join(cache_directory, f'{stage}.json')
+        self.digests_path = os.path.join(cache_directory, 'digests.json')
+        self.manifest = self._load(self.manifest_path)
+        self.digests = self._load(self.digests_path)
+
+        fingerprint = hashlib.sha256()
+        for code_path in code_paths:
+            fingerprint.update(code_path.encode())
+            fingerprint.update(file_digest(code_path).encode())
+        fingerprint.update(json.dumps(params or {}, sort_keys=True).encode())
+        self.fingerprint = fingerprint.hexdigest()
+
+    @staticmethod
+    def _load(path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def raw_digest(self, file_path):
+        """Digest of a raw station file, rehashed only when its size or mtime changed."""
+        stat = os.stat(file_path)
+        known = self.digests.get(file_path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['sha256']
+        digest = file_digest(file_path)
+        self.digests[file_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def key(self, raw_path):
+        return hashlib.sha256(f'{self.fingerprint}:{self.raw_digest(raw_path)}'.encode()).hexdigest()
+
+    def is_fresh(self, station, key):
+        entry = self.manifest.get(station)
+        return (entry is not None and entry['key'] == key
+                and all(os.path.exists(path) for path in entry['outputs']))
+
+    def run(self, fn, file_names, workers, raw_path, output_paths, *args):
+        """Run `fn(file_name, *args)` for the stations whose key changed.
+
+        `raw_path(file_name)` locates a station's raw CSV and
+        `output_paths(file_name)` lists the files `fn` writes. Returns every
+        station's result in file_names order, cached or fresh.
+        """
+        keys = {file_name: self.key(raw_path(file_name)) for file_name in file_names}
+        stale = [file_name for file_name in file_names if not self.is_fresh(file_name, keys[file_name])]
+
+        for file_name, result in zip(stale, map_stations(fn, stale, workers, *args)):
+            self.manifest[file_name] = {
+                'key': keys[file_name], 'outputs': output_paths(file_name), 'result': result
+            }
+        self.save()
+        print(f"{self.stage}: recomputed {len(stale)} of {len(file_names)} stations")
+        return [self.manifest[file_name]['result'] for file_name in file_names]
+
+    def save(self):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        for path, data in ((self.manifest_path, self.manifest), (self.digests_path, self.digests)):
+            with open(path, 'w') as file:
+                json.dump(data, file, indent=2, sort_keys=True, default=lambda value: value.item())
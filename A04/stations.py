@@ -0,0 +1,23 @@
+import os
+import yaml
+from concurrent.futures import ProcessPoolExecutor
+
+def list_station_files(data_directory):
+    """List the station CSV files in sorted order so every stage sees them identically."""
+    return sorted(name for name in os.listdir(data_directory) if name.endswith('.csv'))
+
+def load_workers(params_path='params.yaml'):
+    """Read the number of worker processes from params.yaml (default 1, i.e. serial)."""
+    with open(params_path, 'r') as file:
+        return int(yaml.safe_load(file).get('workers', 1))
+
+def map_stations(fn, file_names, workers, *args):
+    """Apply `fn(file_name, *args)` to every station, in a process pool when workers > 1.
+
+    Results come back in the order of `file_names` regardless of which
+    station finished first, so merging them is deterministic.
+    """
+    if workers <= 1 or len(file_names) <= 1:
+        return [fn(file_name, *args) for file_name in file_names]
+    with ProcessPoolExecutor(max_workers=min(workers, len(file_names))) as executor:
+        return list(executor.map(fn, file_names, *[[arg] * len(file_names) for arg in args]))
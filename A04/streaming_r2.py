@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+CHUNK_ROWS = 65536
+
+def read_columns(file_path):
+    """List the column names of a Parquet or CSV file without reading its rows."""
+    if file_path.endswith('.parquet'):
+        return pq.ParquetFile(file_path).schema_arrow.names
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+def iter_column_chunks(file_path, columns, chunk_rows=CHUNK_ROWS):
+    """Yield float64 arrays of shape (rows, len(columns)), reading at most `chunk_rows` rows at a time."""
+    if file_path.endswith('.parquet'):
+        # Without pre-buffering, only the row group being decoded is held in memory
+        parquet_file = pq.ParquetFile(file_path, pre_buffer=False, buffer_size=1024 * 1024)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield np.column_stack([batch.column(col).to_numpy(zero_copy_only=False) for col in columns]).astype(np.float64)
+    else:
+        for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunk_rows):
+            yield chunk[columns].to_numpy(dtype=np.float64)
+
+def iter_aligned_chunks(first, second):
+    """Pair up two chunk streams row by row, even when their chunk boundaries differ."""
+    pending_a, pending_b = np.empty((0, 0)), np.empty((0, 0))
+    first, second = iter(first), iter(second)
+    while True:
+        if len(pending_a) == 0:
+            pending_a = next(first, None)
+        if len(pending_b) == 0:
+            pending_b = next(second, None)
+        if pending_a is None or pending_b is None:
+            if pending_a is not None or pending_b is not None:
+                raise ValueError("Files have different numbers of rows")
+            return
+        rows = min(len(pending_a), len(pending_b))
+        yield pending_a[:rows], pending_b[:rows]
+        pending_a, pending_b = pending_a[rows:], pending_b[rows:]
+
+class R2Accumulator:
+    """One-pass R2 per column using O(columns) memory.
+
+    Keeps the count, mean and centred sum of squares of y_true (merged chunk
+    by chunk with Chan's parallel update, which avoids the cancellation of a
+    raw sum-of-squares) and the residual sum of squares. Rows where either
+    value is NaN are skipped for that column.
+    """
+
+    def __init__(self, n_columns):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.ss_res = np.zeros(n_columns)
+
+    def update(self, y_true, y_pred):
+        valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+        count = valid.sum(axis=0)
+        y_valid = np.where(valid, y_true, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, y_valid.sum(axis=0) / count, 0.0)
+        m2 = (np.where(valid, y_true - mean, 0.0) ** 2).sum(axis=0)
+        self.ss_res += (np.where(valid, y_true - y_pred, 0.0) ** 2).sum(axis=0)
+
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, count / total, 0.0)
+        self.mean += delta * weight
+        self.m2 += m2 + delta ** 2 * self.count * weight
+        self.count = total
+
+    def scores(self):
+        """R2 per column, following sklearn: a constant y_true scores 1.0 if predicted exactly, else 0.0."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r2 = 1.0 - self.ss_res / self.m2
+        constant = self.m2 == 0
+        r2[constant] = np.where(self.ss_res[constant] == 0, 1.0, 0.0)
+        r2[self.count < 2] = np.nan
+        return r2
+
+def streaming_r2_scores(ground_truth_path, computed_path, chunk_rows=CHUNK_ROWS):
+    """R2 of every column present in both files, reading them in aligned chunks."""
+    computed_columns = read_columns(computed_path)
+    ground_truth_columns = set(read_columns(ground_truth_path))
+    columns = [col for col in computed_columns if col in ground_truth_columns]
+    if not columns:
+        return {}
+
+    accumulator = R2Accumulator(len(columns))
+    for y_true, y_pred in iter_aligned_chunks(
+        iter_column_chunks(ground_truth_path, columns, chunk_rows),
+        iter_column_chunks(computed_path, columns, chunk_rows),
+    ):
+        accumulator.update(y_true, y_pred)
+    return dict(zip(columns, accumulator.scores().tolist()))
@@ -0,0 +1,246 @@
+"""Config-driven MNIST experiment sweep with parallel training and asynchronous MLflow logging.
+
+Each experiment of the notebook is a config dict. `run_sweep` trains them in a
+pool of worker processes, each feeding Keras from a cached, prefetched tf.data
+pipeline that keeps MNIST as uint8 and normalizes every batch on the fly. Metrics
+are queued and written by a background thread in batches, to a local SQLite
+tracking store by default, so no tracking server is needed.
+
+Usage: python experiments.py [--workers 3] [--tracking-uri sqlite:///mlflow.db] [--only "Basic NN,Bigger NN"]
+"""
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import get_context
+
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+NUM_CLASSES = 10
+DEFAULT_TRACKING_URI = "sqlite:///mlflow.db"
+DEFAULT_EXPERIMENT = "MNIST sweep"
+
+BASE = {'hidden': [20, 20], 'activation': 'sigmoid', 'epochs': 10, 'batch_size': 32, 'optimizer': 'rmsprop'}
+BIGGER = dict(BASE, hidden=[256, 128])
+SMALL_SGD = dict(BASE, hidden=[20, 10], optimizer='sgd', learning_rate=0.01)
+
+
+def expand_grid(base, name, **axes):
+    """One config per combination of the `axes` values, named by formatting `name` with them."""
+    keys = list(axes)
+    return [dict(base, name=name.format(**dict(zip(keys, values))), **dict(zip(keys, values)))
+            for values in itertools.product(*(axes[key] for key in keys))]
+
+
+EXPERIMENTS = [
+    dict(BASE, name="Basic NN"),
+    dict(BIGGER, name="Bigger NN"),
+    dict(BIGGER, name="Kernel-reg NN", l2=0.01, epochs=50),
+    dict(BIGGER, name="Dropout NN", dropout=[0.7, 0.6]),
+    dict(BIGGER, name="Early-stop NN", early_stopping={'monitor': 'val_accuracy', 'min_delta': 0.01, 'patience': 2}),
+    *expand_grid(SMALL_SGD, "LR {learning_rate} NN", learning_rate=[0.1, 0.0001, 0.01]),
+    dict(SMALL_SGD, name="Opt LR & Momentum NN", momentum=0.5),
+    dict(SMALL_SGD, name="Mini-batch SGD NN", momentum=0.5, batch_size=512),
+]
+
+
+class AsyncRunLogger:
+    """Logs params and metrics of one MLflow run from a background thread, in batches.
+
+    `log_metrics`/`log_params` only enqueue, so training never waits on the
+    tracking store; the thread writes whatever has accumulated with one
+    `log_batch` call per `max_batch` items or `flush_interval` seconds.
+    """
+
+    def __init__(self, tracking_uri, experiment_id, run_name, parent_run_id=None, max_batch=500, flush_interval=1.0):
+        self.client = MlflowClient(tracking_uri=tracking_uri)
+        tags = {'mlflow.parentRunId': parent_run_id} if parent_run_id else {}
+        self.run_id = self.client.create_run(experiment_id, run_name=run_name, tags=tags).info.run_id
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def log_params(self, params):
+        for key, value in params.items():
+            self._queue.put(Param(key, str(value)))
+
+    def log_metrics(self, metrics, step=0):
+        timestamp = int(time.time() * 1000)
+        for key, value in metrics.items():
+            self._queue.put(Metric(key, float(value), timestamp, step))
+
+    def set_tag(self, key, value):
+        self._queue.put(RunTag(key, str(value)))
+
+    def close(self, status='FINISHED'):
+        """Flush everything still queued and mark the run as terminated."""
+        self._queue.put(None)
+        self._thread.join()
+        self.client.set_terminated(self.run_id, status)
+
+    def _run(self):
+        done = False
+        while not done:
+            items = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(items) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                items.append(item)
+            if items:
+                self.client.log_batch(
+                    self.run_id,
+                    metrics=[item for item in items if isinstance(item, Metric)],
+                    params=[item for item in items if isinstance(item, Param)],
+                    tags=[item for item in items if isinstance(item, RunTag)],
+                )
+
+
+def _init_worker(threads):
+    # Share the cores between the workers instead of every process using all of them
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+@lru_cache(maxsize=1)
+def load_mnist(data_path=None):
+    """MNIST as uint8 arrays, loaded once per process from `data_path` (an mnist.npz) or via Keras."""
+    if data_path:
+        import numpy as np
+        with np.load(data_path) as data:
+            return (data['x_train'], data['y_train']), (data['x_test'], data['y_test'])
+    from tensorflow import keras
+    return keras.datasets.mnist.load_data()
+
+
+def normalize_batch(images, labels):
+    import tensorflow as tf
+    images = tf.reshape(tf.cast(images, tf.float32) / 255.0, (-1, 28 * 28))
+    return images, tf.one_hot(labels, NUM_CLASSES)
+
+
+def make_dataset(images, labels, batch_size, shuffle=False, seed=None):
+    """Batches of normalized images and one-hot labels; only the uint8 source is kept in memory."""
+    import tensorflow as tf
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(images), seed=seed, reshuffle_each_iteration=True)
+    return (dataset
+            .batch(batch_size)
+            .map(normalize_batch, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def build_model(config):
+    from tensorflow import keras
+    from keras import layers, regularizers
+
+    regularizer = regularizers.L2(config['l2']) if config.get('l2') else None
+    dropout = config.get('dropout', [])
+    model = keras.Sequential([keras.Input(shape=(28 * 28,))])
+    for i, units in enumerate(config['hidden']):
+        model.add(layers.Dense(units, activation=config['activation'], kernel_regularizer=regularizer))
+        if i < len(dropout):
+            model.add(layers.Dropout(dropout[i]))
+    model.add(layers.Dense(NUM_CLASSES, activation='softmax'))
+
+    if config['optimizer'] == 'sgd':
+        optimizer = keras.optimizers.SGD(learning_rate=config['learning_rate'], momentum=config.get('momentum', 0.0))
+    else:
+        optimizer = config['optimizer']
+    model.compile(optimizer=optimizer, loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def run_experiment(config, tracking_uri, experiment_id, parent_run_id=None, limit=None, data_path=None):
+    """Train one config and log it; returns its name, run id, final accuracies and history."""
+    from tensorflow import keras
+
+    (x_train, y_train), (x_test, y_test) = load_mnist(data_path)
+    if limit:
+        x_train, y_train, x_test, y_test = x_train[:limit], y_train[:limit], x_test[:limit], y_test[:limit]
+    train = make_dataset(x_train, y_train, config['batch_size'], shuffle=True, seed=0)
+    test = make_dataset(x_test, y_test, 1024)
+
+    logger = AsyncRunLogger(tracking_uri, experiment_id, config['name'], parent_run_id)
+    logger.log_params({key: value for key, value in config.items() if key != 'name'})
+    callbacks = [keras.callbacks.LambdaCallback(on_epoch_end=lambda epoch, logs: logger.log_metrics(logs, step=epoch))]
+    if config.get('early_stopping'):
+        callbacks.append(keras.callbacks.EarlyStopping(**config['early_stopping']))
+    try:
+        model = build_model(config)
+        history = model.fit(train, epochs=config['epochs'], validation_data=test, callbacks=callbacks, shuffle=False, verbose=0)
+        _, test_accuracy = model.evaluate(test, verbose=0)
+        _, train_accuracy = model.evaluate(make_dataset(x_train, y_train, 1024), verbose=0)
+        logger.log_metrics({'test_accuracy': test_accuracy, 'train_accuracy': train_accuracy})
+    except Exception:
+        logger.close('FAILED')
+        raise
+    logger.close()
+    return {
+        'name': config['name'],
+        'run_id': logger.run_id,
+        'test_accuracy': test_accuracy,
+        'train_accuracy': train_accuracy,
+        'history': history.history,
+    }
+
+
+def run_sweep(configs=EXPERIMENTS, workers=None, tracking_uri=DEFAULT_TRACKING_URI,
+              experiment_name=DEFAULT_EXPERIMENT, limit=None, data_path=None):
+    """Train every config in a process pool under one parent run; results come back in config order."""
+    workers = workers or min(len(configs), os.cpu_count() or 1)
+    client = MlflowClient(tracking_uri=tracking_uri)
+    experiment = client.get_experiment_by_name(experiment_name)
+    experiment_id = experiment.experiment_id if experiment else client.create_experiment(experiment_name)
+    parent_run_id = client.create_run(experiment_id, run_name="sweep").info.run_id
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # TensorFlow is not fork-safe, so the workers are spawned
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads,)) as executor:
+        futures = [executor.submit(run_experiment, config, tracking_uri, experiment_id, parent_run_id, limit, data_path)
+                   for config in configs]
+        try:
+            results = [future.result() for future in futures]
+        except Exception:
+            client.set_terminated(parent_run_id, 'FAILED')
+            raise
+    client.set_terminated(parent_run_id)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the MNIST experiment sweep")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tracking-uri', default=DEFAULT_TRACKING_URI)
+    parser.add_argument('--experiment', default=DEFAULT_EXPERIMENT)
+    parser.add_argument('--only', default=None, help="comma-separated experiment names")
+    parser.add_argument('--epochs', type=int, default=None, help="override the epochs of every experiment")
+    parser.add_argument('--limit', type=int, default=None, help="train and test on the first LIMIT images only")
+    parser.add_argument('--data', default=None, help="local mnist.npz instead of the Keras download")
+    args = parser.parse_args()
+
+    configs = EXPERIMENTS
+    if args.only:
+        names = {name.strip() for name in args.only.split(',')}
+        configs = [config for config in configs if config['name'] in names]
+    if args.epochs:
+        configs = [dict(config, epochs=args.epochs) for config in configs]
+    start = time.perf_counter()
+    for result in run_sweep(configs, args.workers, args.tracking_uri, args.experiment, args.limit, args.data):
+        print(f"{result['name']:24s} test {result['test_accuracy']:.4f}  train {result['train_accuracy']:.4f}")
+    print(f"{len(configs)} experiments in {time.perf_counter() - start:.1f}s")
@@ -1,63 +1,133 @@
 import os
+import sys
 import uvicorn
 import asyncio
-from typing import Union
-from fastapi import FastAPI, File, UploadFile
+from typing import Optional, Union
+from fastapi import BackgroundTasks, FastAPI, File, Request, UploadFile
 from fastapi.responses import JSONResponse
+import io
 import uuid
 from PIL import Image
 import numpy as np
-from tensorflow.keras.models import load_model as tf_load_model
+from prometheus_client import make_asgi_app
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mnist_common.backends import load_backend
+from mnist_common.batch_api import batch_prediction_response
+from mnist_common.batching import MicroBatcher
+from mnist_common.cache import PredictionCache, bytes_key, pixels_key
+from mnist_common.preprocessing import N_FEATURES, preprocess_images
+from mnist_common.tracing import RequestTrace
+from mnist_common.uploads import payload_limit_middleware, persist_upload, read_upload
+
+# Uploads are decoded from memory. Set MNIST_PERSIST_UPLOADS=1 to also keep a
+# copy of every upload in UPLOAD_DIR for auditing; it is written after the
+# response is sent.
 UPLOAD_DIR = "uploaded_images/"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+PERSIST_UPLOADS = os.environ.get("MNIST_PERSIST_UPLOADS", "0") == "1"
+MAX_UPLOAD_BYTES = int(os.environ.get("MNIST_MAX_UPLOAD_BYTES", str(1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.environ.get("MNIST_MAX_BATCH_UPLOAD_BYTES", str(256 * 1024 * 1024)))
 
 app = FastAPI()
+app.mount("/metrics", make_asgi_app())
+app.middleware("http")(
+    payload_limit_middleware(MAX_UPLOAD_BYTES, {"/predict/batch": MAX_BATCH_UPLOAD_BYTES})
+)
 
-MODEL_FILE_PATH = "C:\\Users\\saicharan\\Downloads\\mnist-epoch.hdf5"
+# MNIST_BACKEND selects keras (the .hdf5 model), tflite (a converted .tflite
+# file) or numpy (a weight export from mnist_common.weights, no TensorFlow)
+INFERENCE_BACKEND = os.environ.get("MNIST_BACKEND", "keras")
+MODEL_FILE_PATH = os.environ.get("MNIST_MODEL_PATH", "C:\\Users\\saicharan\\Downloads\\mnist-epoch.hdf5")
 model_instance = None
 
+# Concurrent uploads are merged into one model call of up to MAX_BATCH_SIZE
+# rows, waiting at most MAX_BATCH_WAIT_MS for the batch to fill up.
+MAX_BATCH_SIZE = int(os.environ.get("MNIST_MAX_BATCH_SIZE", "32"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("MNIST_MAX_BATCH_WAIT_MS", "5"))
+
 def load_model(model_path: str):
-    """Load the trained Keras model from the specified path."""
-    return tf_load_model(model_path)
+    """Load the trained model from the specified path with the configured backend."""
+    return load_backend(INFERENCE_BACKEND, model_path)
 
-async def get_model_instance():
+def get_model_instance():
     """Retrieve the model, loading it if not already loaded."""
     global model_instance
     if model_instance is None:
         model_instance = load_model(MODEL_FILE_PATH)
     return model_instance
 
+def predict_batch(batch: np.ndarray) -> np.ndarray:
+    """Run the model once on a stacked (N, 784) batch of images."""
+    return get_model_instance().predict(batch)
+
+batcher = MicroBatcher(predict_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS)
+
+# Repeated uploads are answered from an LRU cache keyed by a hash of the bytes
+prediction_cache = PredictionCache.from_env("a06")
+
+@app.on_event("startup")
+async def start_batcher():
+    """Start draining the inference queue."""
+    await batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    """Stop the inference queue worker."""
+    await batcher.stop()
+
 def preprocess_image(image: Image.Image) -> np.ndarray:
     """Preprocess the image for model prediction."""
-    # Convert the image to grayscale and resize to 28x28
-    image = image.convert("L").resize((28, 28))
-    # Convert the image to a numpy array, flatten, and normalize the pixel values
-    image_array = np.array(image).reshape(1, 784) / 255.0
-    return image_array
+    # Grayscale, resize to 28x28, flatten and normalize into a (1, 784) float32 row.
+    # The row waits in the batcher queue, so it gets its own array rather than
+    # a view into the shared staging buffers that the next request reuses
+    return preprocess_images([image], out=np.empty((1, N_FEATURES), dtype=np.float32))
 
-async def predict_digit(image: Image.Image) -> str:
+async def predict_digit(image: Image.Image, trace: Optional[RequestTrace] = None) -> str:
     """Make a prediction on the given image."""
-    model = await get_model_instance()
-    processed_image = preprocess_image(image)
-    prediction = model.predict(processed_image)
-    predicted_digit = np.argmax(prediction)
-    return str(predicted_digit)
+    trace = trace or RequestTrace("a06")
+    with trace.stage("preprocess"):
+        processed_image = preprocess_image(image)
+    pixel_key = pixels_key(processed_image) if prediction_cache.cache_pixels else None
+    if pixel_key is not None:
+        cached_digit = prediction_cache.get(pixel_key)
+        if cached_digit is not None:
+            return cached_digit
+
+    prediction, (enqueued_at, flushed_at, done_at) = await batcher.submit_timed(processed_image)
+    trace.record("queue_wait", enqueued_at, flushed_at)
+    trace.record("inference", flushed_at, done_at)
+    predicted_digit = str(np.argmax(prediction))
+    prediction_cache.put(pixel_key, predicted_digit)
+    return predicted_digit
 
 @app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)) -> JSONResponse:
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)) -> JSONResponse:
     """Handle the uploaded file, make a prediction, and return the result."""
-    filename = f"{uuid.uuid4()}.jpg"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    image = Image.open(file_path)
-    prediction_result = await predict_digit(image)
-    
-    os.remove(file_path)
-    return {"predicted_digit": prediction_result}
+    trace = RequestTrace("a06")
+    with trace.stage("body_read"):
+        contents = await read_upload(file, MAX_UPLOAD_BYTES)
+    if PERSIST_UPLOADS:
+        file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.jpg")
+        background_tasks.add_task(persist_upload, contents, file_path)
+
+    cache_key = bytes_key(contents) if prediction_cache.enabled else None
+    prediction_result = prediction_cache.get(cache_key)
+    if prediction_result is None:
+        with trace.stage("decode"):
+            image = Image.open(io.BytesIO(contents))
+            image.load()
+        prediction_result = await predict_digit(image, trace)
+        prediction_cache.put(cache_key, prediction_result)
+
+    with trace.stage("serialize"):
+        response = JSONResponse({"predicted_digit": prediction_result})
+    trace.finish(payload_bytes=len(contents))
+    return response
+
+@app.post("/predict/batch")
+async def upload_batch(request: Request):
+    """Predict many images from a multipart upload or a packed .npy/uint8 body, in input order."""
+    return await batch_prediction_response(request, predict_batch, max_bytes=MAX_BATCH_UPLOAD_BYTES)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
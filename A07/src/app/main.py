@@ -1,23 +1,59 @@
+import argparse
+import asyncio
 import io
 import os
+import sys
 import time
 from PIL import Image
 import numpy as np
 import uvicorn
 import psutil
-from fastapi import FastAPI, UploadFile, File, Request
-from prometheus_client import Counter, Gauge, start_http_server
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 from prometheus_fastapi_instrumentator import Instrumentator
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from mnist_common.admission import AdmissionController, Rejected
+from mnist_common.batch_api import batch_prediction_response
+from mnist_common.cache import PredictionCache, bytes_key, pixels_key
+from mnist_common.preprocessing import preprocess_images
+from mnist_common.tracing import RequestTrace, client_class
+from mnist_common.uploads import payload_limit_middleware, read_upload
+from mnist_common.backends import load_backend
+
+# Upload size limits; larger bodies are refused with 413 before they are read
+MAX_UPLOAD_BYTES = int(os.environ.get("MNIST_MAX_UPLOAD_BYTES", str(1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.environ.get("MNIST_MAX_BATCH_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+
 # Initialize FastAPI application
 app = FastAPI()
+app.middleware("http")(
+    payload_limit_middleware(MAX_UPLOAD_BYTES, {"/predict/batch": MAX_BATCH_UPLOAD_BYTES})
+)
+
+# Weights exported with `python -m mnist_common.weights` are memory-mapped, so
+# every worker process shares one copy of them and starts in milliseconds.
+# MNIST_BACKEND=keras or tflite serves a model file from MNIST_WEIGHTS_PATH instead.
+WEIGHTS_PATH = os.environ.get("MNIST_WEIGHTS_PATH")
+INFERENCE_BACKEND = os.environ.get("MNIST_BACKEND", "numpy")
+model = load_backend(INFERENCE_BACKEND, WEIGHTS_PATH) if WEIGHTS_PATH else None
+
+# Repeated uploads are answered from an LRU cache keyed by a hash of the bytes
+prediction_cache = PredictionCache.from_env("a07")
+
+# Decode and inference run on a sized thread (or MNIST_WORKER_POOL=process) pool
+# behind a concurrency limit with a bounded wait queue; bursts beyond it are shed
+# with 503 + Retry-After and requests past their deadline are dropped
+admission = AdmissionController.from_env("a07")
 
 # Instrument FastAPI application for Prometheus monitoring
 Instrumentator().instrument(app).expose(app)
 
 # Define Prometheus metrics
+# Clients are bucketed into loopback/private/public; raw IPs are unbounded
 REQUEST_COUNTER = Counter(
-    'api_requests_total', 'Total number of API requests', ['client_ip']
+    'api_requests_total', 'Total number of API requests', ['client_class']
 )
 RUN_TIME_GAUGE = Gauge('api_run_time_seconds', 'Running time of the API')
 TL_TIME_GAUGE = Gauge(
@@ -25,80 +61,215 @@ TL_TIME_GAUGE = Gauge(
 )
 MEMORY_USAGE_GAUGE = Gauge('api_memory_usage_kb', 'Memory usage of the API process')
 CPU_USAGE_GAUGE = Gauge('api_cpu_usage_percent', 'CPU usage of the API process')
+# psutil has no per-process network counters, so these are host-wide (all
+# interfaces, all processes); the names are kept for existing dashboards
 NETWORK_BYTES_SENT_GAUGE = Gauge(
-    'api_network_bytes_sent', 'Network bytes sent by the API process'
+    'api_network_bytes_sent', 'Network bytes sent by the host (system-wide, not per process)'
 )
 NETWORK_BYTES_RECV_GAUGE = Gauge(
-    'api_network_bytes_received', 'Network bytes received by the API process'
+    'api_network_bytes_received', 'Network bytes received by the host (system-wide, not per process)'
 )
 
+# Per-request metrics; these are cheap enough to record inside the handler
+REQUEST_LATENCY_HISTOGRAM = Histogram(
+    'api_request_latency_seconds', 'Latency of prediction requests',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+PAYLOAD_BYTES_HISTOGRAM = Histogram(
+    'api_payload_bytes', 'Size of uploaded images in bytes',
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+TL_TIME_HISTOGRAM = Histogram(
+    'api_tl_time_microseconds_per_byte', 'Processing time per uploaded byte',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100)
+)
+
+# Process-level resource usage is sampled in the background on this interval
+RESOURCE_SAMPLE_INTERVAL = float(os.environ.get("MNIST_RESOURCE_SAMPLE_INTERVAL", "5"))
+
 def preprocess_image(image):
-    'Resize and convert the image to grayscale'
-    resized_image = image.resize((28, 28)).convert("L")
-    image_array = np.array(resized_image)
-    flattened_image = image_array.flatten()
-    return flattened_image
+    'Convert the image to grayscale, resize it to 28x28 and flatten it'
+    return preprocess_images([image])[0].copy()                 # Own row, not the reused buffer
+
+def predict_probabilities(data):
+    'Class scores for a preprocessed (N, 784) batch'
+    if model is None:
+        return np.random.rand(len(data), 10)  # Placeholder until weights are configured
+    return model.predict(data)
+
+def predict_digit_from_array(data):
+    'Predict digit from a preprocessed (1, 784) row'
+    return str(np.argmax(predict_probabilities(data)))
 
 def predict_digit_from_image(data):
     'Predict digit from image data'
-    if data.size != (28, 28):
-        data = preprocess_image(data).reshape((1, 784))
-    else:
-        data = data.convert("L").reshape((1, 784))
-    return str(np.random.randint(10))  # Placeholder for predicted digit
+    return predict_digit_from_array(preprocess_images([data]))
+
+def decode_upload(contents):
+    'Open and load an uploaded image; bytes PIL cannot read are a client error (400)'
+    try:
+        image = Image.open(io.BytesIO(contents))                # Open image using PIL
+        image.load()
+    except OSError as exc:                                      # Includes UnidentifiedImageError
+        # Positional arguments, so the exception unpickles when raised in a process worker
+        raise HTTPException(400, f"Could not decode image: {exc}")
+    return image
+
+def predict_digit_from_bytes(contents, trace):
+    'Decode, preprocess and predict an uploaded image, timing each stage'
+    with trace.stage("decode"):
+        image = decode_upload(contents)
+    with trace.stage("preprocess"):
+        data = preprocess_images([image])                       # (1, 784) float32 row
+    pixel_key = pixels_key(data) if prediction_cache.cache_pixels else None
+    if pixel_key is not None:
+        cached_digit = prediction_cache.get(pixel_key)
+        if cached_digit is not None:
+            return cached_digit
+    with trace.stage("inference"):
+        predicted_digit = predict_digit_from_array(data)        # Predict digit in image
+    prediction_cache.put(pixel_key, predicted_digit)
+    return predicted_digit
+
+def predict_digit_in_worker(contents):
+    'Decode, preprocess and predict in a pool worker process; the model is loaded when it imports this module'
+    return predict_digit_from_array(preprocess_images([decode_upload(contents)]))
 
-def process_memory_usage():
-    'Get current process memory usage in kilobytes'
-    return psutil.virtual_memory().used / 1024
+def warm_up_worker():
+    'Run one prediction so a pool worker has imported this module and paged in the model'
+    predict_probabilities(np.zeros((1, 784), dtype=np.float32))
+
+def process_memory_usage(process):
+    'Get current process memory usage (RSS) in kilobytes'
+    return process.memory_info().rss / 1024
+
+def sample_resource_usage(process):
+    'Publish one sample of process CPU and RSS and host-wide network counters to the gauges'
+    CPU_USAGE_GAUGE.set(process.cpu_percent(interval=None))     # CPU since the previous sample
+    MEMORY_USAGE_GAUGE.set(process_memory_usage(process))
+    network_io_counters = psutil.net_io_counters()              # Host-wide, all interfaces
+    NETWORK_BYTES_SENT_GAUGE.set(network_io_counters.bytes_sent)
+    NETWORK_BYTES_RECV_GAUGE.set(network_io_counters.bytes_recv)
+
+async def collect_resource_metrics(interval):
+    'Sample resource usage every `interval` seconds, outside the request path'
+    process = psutil.Process()
+    process.cpu_percent(interval=None)                          # Prime the CPU counter
+    while True:
+        sample_resource_usage(process)
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_resource_collector():
+    'Start the background resource metrics collector'
+    app.state.resource_collector = asyncio.create_task(
+        collect_resource_metrics(RESOURCE_SAMPLE_INTERVAL)
+    )
+
+@app.on_event("startup")
+async def start_admission_pool():
+    'Start the worker pool that decoding and inference are offloaded to'
+    await admission.start(warm_up=warm_up_worker)
+
+@app.on_event("shutdown")
+async def stop_resource_collector():
+    'Stop the background resource metrics collector'
+    app.state.resource_collector.cancel()
+
+@app.on_event("shutdown")
+async def stop_admission_pool():
+    'Shut down the inference worker pool'
+    admission.stop()
 
 @app.post("/predict/")
 async def predict_digit_api(request: Request, file: UploadFile = File(...)):
     'Predict digit from uploaded image file'
 
-    start_time = time.time()                                    # Start time of API call
-    initial_memory_usage = process_memory_usage()                # Initial memory usage
+    start_time = time.perf_counter()                            # Start time of API call
+    trace = RequestTrace("a07")                                 # Per-stage timings
+    deadline = admission.deadline(request.headers, start_time)  # Server timeout, or the client's if shorter
     
-    contents = await file.read()                                # Read image file contents
-    image = Image.open(io.BytesIO(contents))                    # Open image using PIL
+    with trace.stage("body_read"):
+        contents = await read_upload(file, MAX_UPLOAD_BYTES)    # Read image file contents, up to the limit
     
     client_ip = request.client.host                             # Get client's IP address
     
-    network_io_counters = psutil.net_io_counters()              # Network I/O counters
-    
-    predicted_digit = predict_digit_from_image(image)           # Predict digit in image
-    
-    cpu_percent = psutil.cpu_percent(interval=1)                # CPU usage percentage
-    final_memory_usage = process_memory_usage()                 # Final memory usage
-    
-    CPU_USAGE_GAUGE.set(cpu_percent)                            # Set CPU usage gauge
-    MEMORY_USAGE_GAUGE.set(abs(final_memory_usage - initial_memory_usage))  # Set memory usage gauge
-    NETWORK_BYTES_SENT_GAUGE.set(network_io_counters.bytes_sent)           # Set network bytes sent gauge
-    NETWORK_BYTES_RECV_GAUGE.set(network_io_counters.bytes_recv)           # Set network bytes received gauge
+    cache_key = bytes_key(contents) if prediction_cache.enabled else None
+    predicted_digit = prediction_cache.get(cache_key)           # Identical uploads skip PIL and the model
+    if predicted_digit is None:
+        if admission.uses_processes:
+            job = (predict_digit_in_worker, contents)           # The trace cannot cross into a worker process
+        else:
+            job = (predict_digit_from_bytes, contents, trace)
+        try:
+            predicted_digit = await admission.run(
+                *job, deadline=deadline, is_disconnected=request.is_disconnected, trace=trace
+            )
+        except Rejected as rejection:                           # Shed: queue full, deadline passed or client gone
+            trace.finish(payload_bytes=len(contents), rejected=rejection.reason)
+            return JSONResponse(
+                {"detail": rejection.detail}, status_code=rejection.status_code, headers=rejection.headers
+            )
+        prediction_cache.put(cache_key, predicted_digit)
     
     # Calculate API running time
-    end_time = time.time()
+    end_time = time.perf_counter()
     run_time = end_time - start_time
     
     # Record API usage metrics
-    REQUEST_COUNTER.labels(client_ip).inc()                      # Increment request counter             
+    REQUEST_COUNTER.labels(client_class(client_ip)).inc()       # Increment request counter
     RUN_TIME_GAUGE.set(run_time)                                # Set running time gauge
+    REQUEST_LATENCY_HISTOGRAM.observe(run_time)                 # Record request latency
     
     # Calculate T/L time
     input_length = len(contents)
-    tl_time = (run_time / input_length) * 1e6                    # microseconds per pixel
+    tl_time = (run_time / max(input_length, 1)) * 1e6           # microseconds per byte
     TL_TIME_GAUGE.set(tl_time)                                  # Set T/L time gauge
+    TL_TIME_HISTOGRAM.observe(tl_time)
+    PAYLOAD_BYTES_HISTOGRAM.observe(input_length)
     
-    return {"predicted_digit": predicted_digit}
+    with trace.stage("serialize"):
+        response = JSONResponse({"predicted_digit": predicted_digit})
+    trace.finish(payload_bytes=input_length)
+    return response
+
+@app.post("/predict/batch")
+async def predict_batch_api(request: Request):
+    'Predict digits for many images (multipart files or a packed .npy/uint8 body) in input order'
+
+    async def admitted(fn, *args):
+        'Each chunk takes an admission slot and waits at most the request timeout for it'
+        try:
+            return await admission.run(
+                fn, *args, deadline=admission.deadline(request.headers), is_disconnected=request.is_disconnected
+            )
+        except Rejected as rejection:
+            raise HTTPException(rejection.status_code, rejection.detail, headers=rejection.headers)
+
+    return await batch_prediction_response(
+        request, predict_probabilities, max_bytes=MAX_BATCH_UPLOAD_BYTES, run=admitted
+    )
 
 if __name__ == "__main__":
-    # Start Prometheus metrics server
-    start_http_server(8001)
-    
-    # Run FastAPI application
-    uvicorn.run(
-        "main:app",
-        reload=True,
-        workers=1,
-        host="0.0.0.0",
-        port=8002
-    )
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Serve the MNIST digit prediction API")
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="number of worker processes; 0 runs a single auto-reloading development server"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        # Production mode: N workers without reload, all mapping the same weights
+        uvicorn.run("main:app", workers=args.workers, host="0.0.0.0", port=8002)
+    else:
+        # Start Prometheus metrics server
+        start_http_server(8001)
+
+        # Run FastAPI application
+        uvicorn.run(
+            "main:app",
+            reload=True,
+            workers=1,
+            host="0.0.0.0",
+            port=8002
+        )
\ No newline at end of file
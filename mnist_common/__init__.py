@@ -0,0 +1 @@
+"""Serving helpers shared by the A06 and A07 MNIST digit prediction apps."""
@@ -0,0 +1,216 @@
+"""Admission control and backpressure for the CPU-bound part of a prediction.
+
+At most `max_concurrency` requests decode and predict at once, on a sized
+thread or process pool so the event loop only does I/O. Up to `max_queue`
+more wait for a slot; beyond that a request is shed at once with 503 and a
+Retry-After header instead of joining an unbounded backlog. Every request
+carries a deadline (MNIST_REQUEST_TIMEOUT_MS, or a shorter X-Request-Timeout-Ms
+header from the client); one still waiting when it passes gets 504, and one
+whose client has disconnected is dropped before it reaches the pool. Work
+already running on the pool is allowed to finish so the slot count stays true.
+
+Configured with MNIST_MAX_CONCURRENCY (default: CPU count), MNIST_MAX_QUEUE
+(default 64), MNIST_RETRY_AFTER (seconds, default 1), MNIST_REQUEST_TIMEOUT_MS
+(default 5000, 0 = no deadline), MNIST_WORKER_POOL (thread or process, default
+thread) and MNIST_POOL_SIZE (default: the concurrency limit).
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Awaitable, Callable, Mapping, Optional
+
+from prometheus_client import Counter, Gauge
+
+from mnist_common.tracing import RequestTrace
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+# How long a process worker waits at start-up for the rest of the pool to warm up
+WARM_UP_TIMEOUT = 300
+
+ADMISSION_QUEUE_DEPTH_GAUGE = Gauge(
+    'admission_queue_depth', 'Requests waiting for an inference slot', ['app']
+)
+ADMISSION_IN_FLIGHT_GAUGE = Gauge(
+    'admission_in_flight', 'Requests decoding or predicting on the worker pool', ['app']
+)
+ADMISSION_REJECTIONS_COUNTER = Counter(
+    'admission_rejections_total', 'Requests shed or dropped before inference', ['app', 'reason']
+)
+
+
+class Rejected(Exception):
+    """A request that was not admitted; carries the HTTP status and headers to answer with."""
+
+    def __init__(self, reason: str, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.reason = reason
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+
+
+def _init_process_worker(warm_up: Optional[Callable[[], None]], barrier):
+    # Unpickling `warm_up` imports its module in the worker; the barrier keeps any
+    # worker from taking start-up jobs until every worker has warmed up
+    if warm_up is not None:
+        warm_up()
+    barrier.wait(WARM_UP_TIMEOUT)
+
+
+async def _acquire(semaphore: asyncio.Semaphore, timeout: Optional[float]) -> bool:
+    """Wait up to `timeout` seconds for `semaphore`; True once it is held.
+
+    Unlike `asyncio.wait_for` before Python 3.12, a unit acquired just as the
+    timeout fires is kept rather than lost, and a cancelled wait gives back any
+    unit it had already been granted.
+    """
+    acquire = asyncio.ensure_future(semaphore.acquire())
+    try:
+        await asyncio.wait({acquire}, timeout=timeout)
+    except asyncio.CancelledError:
+        if acquire.done() and not acquire.cancelled():
+            semaphore.release()
+        else:
+            acquire.cancel()
+        raise
+    if acquire.done():
+        return True
+    acquire.cancel()
+    return False
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded wait queue in front of a worker pool."""
+
+    def __init__(self, app_name: str, max_concurrency: Optional[int] = None, max_queue: int = 64,
+                 retry_after: int = 1, timeout_ms: float = 5000, pool: str = "thread",
+                 pool_size: Optional[int] = None):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"pool must be 'thread' or 'process', not {pool!r}")
+        self.app_name = app_name
+        self.max_concurrency = max(1, max_concurrency or os.cpu_count() or 1)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.timeout = timeout_ms / 1000.0
+        self.pool = pool
+        self.pool_size = pool_size or self.max_concurrency
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._admitted = 0      # Waiting or holding a slot; counted on entry so bursts see it at once
+        self._waiting = 0
+        self._in_flight = 0
+        self._queue_depth = ADMISSION_QUEUE_DEPTH_GAUGE.labels(app_name)
+        self._in_flight_gauge = ADMISSION_IN_FLIGHT_GAUGE.labels(app_name)
+
+    @classmethod
+    def from_env(cls, app_name: str) -> "AdmissionController":
+        return cls(
+            app_name,
+            max_concurrency=int(os.environ.get("MNIST_MAX_CONCURRENCY", "0")) or None,
+            max_queue=int(os.environ.get("MNIST_MAX_QUEUE", "64")),
+            retry_after=int(os.environ.get("MNIST_RETRY_AFTER", "1")),
+            timeout_ms=float(os.environ.get("MNIST_REQUEST_TIMEOUT_MS", "5000")),
+            pool=os.environ.get("MNIST_WORKER_POOL", "thread"),
+            pool_size=int(os.environ.get("MNIST_POOL_SIZE", "0")) or None,
+        )
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.pool == "process"
+
+    async def start(self, warm_up: Optional[Callable[[], None]] = None):
+        """Create the worker pool and run `warm_up` on it before the first request.
+
+        `warm_up` should be a module-level function of the app that touches the
+        model: every process worker runs it once, which imports the app module
+        there and so loads the model; a thread pool runs it once.
+        """
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        if self.uses_processes:
+            # Spawned rather than forked: the server process already runs threads
+            context = get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.pool_size, mp_context=context,
+                initializer=_init_process_worker, initargs=(warm_up, context.Barrier(self.pool_size)),
+            )
+            # One job per worker makes the pool start them all; none runs until all have warmed up
+            await asyncio.gather(*(loop.run_in_executor(self._executor, os.getpid) for _ in range(self.pool_size)))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="predict")
+            if warm_up is not None:
+                await loop.run_in_executor(self._executor, warm_up)
+
+    def stop(self):
+        """Shut the pool down, abandoning work that has not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def deadline(self, headers: Mapping[str, str], start: Optional[float] = None) -> Optional[float]:
+        """Deadline of a request on the perf_counter clock: the server timeout, shortened by the client's header."""
+        start = time.perf_counter() if start is None else start
+        timeout = self.timeout
+        requested = headers.get(TIMEOUT_HEADER)
+        if requested:
+            try:
+                requested_timeout = float(requested) / 1000.0
+            except ValueError:
+                requested_timeout = 0
+            if requested_timeout > 0:
+                timeout = min(timeout, requested_timeout) if timeout > 0 else requested_timeout
+        return start + timeout if timeout > 0 else None
+
+    def _reject(self, reason: str, status_code: int, detail: str, retry: bool = False) -> Rejected:
+        ADMISSION_REJECTIONS_COUNTER.labels(self.app_name, reason).inc()
+        return Rejected(reason, status_code, detail, self.retry_after if retry else None)
+
+    def _set_waiting(self, delta: int):
+        self._waiting += delta
+        self._queue_depth.set(self._waiting)
+
+    def _set_in_flight(self, delta: int):
+        self._in_flight += delta
+        self._in_flight_gauge.set(self._in_flight)
+
+    async def run(self, fn: Callable, *args, deadline: Optional[float] = None,
+                  is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                  trace: Optional[RequestTrace] = None):
+        """Run `fn(*args)` on the pool once a slot is free; raises Rejected if the request is not admitted.
+
+        The time spent waiting for the slot is recorded as the `queue_wait` stage of `trace`.
+        """
+        if self._slots is None:
+            raise RuntimeError("AdmissionController.start() has not been awaited")
+        if self._admitted >= self.max_concurrency + self.max_queue:
+            raise self._reject("queue_full", 503, "Server is overloaded, retry later", retry=True)
+
+        self._admitted += 1
+        try:
+            self._set_waiting(1)
+            queued_at = time.perf_counter()
+            try:
+                timeout = None if deadline is None else deadline - time.perf_counter()
+                if timeout is not None and timeout <= 0:
+                    raise self._reject("deadline", 504, "Request deadline passed before it was admitted")
+                if not await _acquire(self._slots, timeout):
+                    raise self._reject("deadline", 504, "Request deadline passed while queued")
+            finally:
+                self._set_waiting(-1)
+            if trace is not None:
+                trace.record("queue_wait", queued_at, time.perf_counter())
+
+            try:
+                if is_disconnected is not None and await is_disconnected():
+                    raise self._reject("disconnected", 503, "Client disconnected while queued")
+                self._set_in_flight(1)
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+                finally:
+                    self._set_in_flight(-1)
+            finally:
+                self._slots.release()
+        finally:
+            self._admitted -= 1
@@ -0,0 +1,106 @@
+"""Pluggable inference backends for the MNIST models.
+
+* `keras`  - the trained .hdf5 model through TensorFlow (default);
+* `tflite` - a .tflite conversion run by `tflite_runtime`, or by TensorFlow's
+  bundled interpreter when the slim runtime is not installed;
+* `numpy`  - Dense weights exported with `python -m mnist_common.weights`,
+  memory-mapped and evaluated in pure NumPy without importing TensorFlow.
+
+Every backend exposes `predict(batch)` mapping a float32 (N, 784) array to
+(N, 10) class scores.
+
+Usage: python -m mnist_common.backends MODEL.hdf5 OUTPUT.tflite
+"""
+import sys
+import threading
+
+import numpy as np
+
+from mnist_common.weights import load_dense_network
+
+
+class KerasBackend:
+    def __init__(self, model_path: str):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend:
+    """A tflite interpreter is not thread-safe, so each calling thread gets its own."""
+
+    def __init__(self, model_path: str):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.model_path = model_path
+        self._interpreter_class = Interpreter
+        self._local = threading.local()
+        self._state()  # Fail on a bad model file at load time, not on the first request
+
+    def _state(self) -> threading.local:
+        state = self._local
+        if not hasattr(state, "interpreter"):
+            state.interpreter = self._interpreter_class(model_path=self.model_path)
+            state.input_index = state.interpreter.get_input_details()[0]["index"]
+            state.output_index = state.interpreter.get_output_details()[0]["index"]
+            state.batch_size = None
+        return state
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        state = self._state()
+        interpreter = state.interpreter
+        if len(batch) != state.batch_size:
+            interpreter.resize_tensor_input(state.input_index, batch.shape)
+            interpreter.allocate_tensors()
+            state.batch_size = len(batch)
+        interpreter.set_tensor(state.input_index, batch)
+        interpreter.invoke()
+        return interpreter.get_tensor(state.output_index).copy()
+
+
+class NumpyBackend:
+    def __init__(self, model_path: str):
+        self.network = load_dense_network(model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.network.predict(batch)
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "numpy": NumpyBackend,
+}
+
+
+def load_backend(name: str, model_path: str):
+    """Load `model_path` with the backend called `name`."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](model_path)
+
+
+def export_tflite(model_path: str, output_path: str):
+    """Convert a Keras model to a .tflite flatbuffer."""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    with open(output_path, "wb") as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    export_tflite(*sys.argv[1:])
+    print(f"Wrote {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Shared implementation of the `/predict/batch` endpoint.
+
+Two request forms are accepted:
+
+* `multipart/form-data` with any number of image files in the `files` field;
+* a packed binary body (`application/octet-stream` or `application/x-npy`):
+  either a `.npy` array of shape (N, 28, 28) or (N, 784), or a raw uint8
+  buffer of N*784 bytes.
+
+Images are decoded, preprocessed and predicted in chunks of `chunk_size`
+rows, so peak memory stays at one chunk of features however large the batch.
+Results come back in input order, as one JSON document for small batches or
+as NDJSON lines, one per image, once the batch reaches `stream_threshold` (or
+`?stream=true`); a streamed response starts after the first chunk.
+"""
+import io
+import json
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from mnist_common.preprocessing import IMAGE_SIZE, N_FEATURES, preprocess_images
+from mnist_common.uploads import read_request_body
+
+NPY_MAGIC = b"\x93NUMPY"
+
+
+def unpack_array(body: bytes) -> np.ndarray:
+    """Validate a .npy payload or raw uint8 N*784 buffer and view it as (N, 784) rows, without converting."""
+    if body.startswith(NPY_MAGIC):
+        try:
+            array = np.load(io.BytesIO(body), allow_pickle=False)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid .npy payload: {exc}")
+    else:
+        if len(body) % N_FEATURES:
+            raise HTTPException(
+                status_code=400, detail=f"Raw payload length must be a multiple of {N_FEATURES} bytes"
+            )
+        array = np.frombuffer(body, dtype=np.uint8).reshape(-1, N_FEATURES)
+
+    if array.shape[1:] not in ((N_FEATURES,), IMAGE_SIZE) or array.dtype.kind not in "uif":
+        raise HTTPException(status_code=400, detail="Array must be numeric with shape (N, 28, 28) or (N, 784)")
+    return array.reshape(-1, N_FEATURES)
+
+
+def rows_to_features(rows: np.ndarray) -> np.ndarray:
+    """Scale uint8 rows to [0, 1]; other numeric rows are taken as already scaled."""
+    if rows.dtype == np.uint8:
+        return np.multiply(rows, np.float32(1.0 / 255.0), dtype=np.float32)
+    return np.ascontiguousarray(rows, dtype=np.float32)
+
+
+def decode_packed_array(body: bytes) -> np.ndarray:
+    """Turn a .npy payload or raw uint8 N*784 buffer into a float32 (N, 784) array."""
+    return rows_to_features(unpack_array(body))
+
+
+def predict_chunk(predict_fn: Callable[[np.ndarray], np.ndarray], chunk) -> np.ndarray:
+    """Digits for one chunk: a list of encoded images, or packed (n, 784) rows.
+
+    Decoding happens here, chunk by chunk, so only one chunk of float32
+    features is alive at a time. Module-level so it can run in a process pool.
+    """
+    features = preprocess_images(chunk) if isinstance(chunk, list) else rows_to_features(chunk)
+    return np.argmax(predict_fn(features), axis=1)
+
+
+class BatchInput:
+    """The images of one batch request, still encoded; read chunk by chunk."""
+
+    def __init__(self, uploads=None, rows: Optional[np.ndarray] = None):
+        self.uploads = uploads
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.uploads) if self.uploads is not None else len(self.rows)
+
+    async def chunk(self, start: int, end: int):
+        if self.uploads is not None:
+            return [await upload.read() for upload in self.uploads[start:end]]
+        return self.rows[start:end]
+
+
+async def read_batch_input(request: Request, max_files: int, max_bytes: int) -> BatchInput:
+    """Accept either batch request form; multipart files stay spooled by the form parser until their chunk."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form(max_files=max_files)
+        uploads = form.getlist("files")
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No files in the 'files' field")
+        return BatchInput(uploads=uploads)
+
+    body = await read_request_body(request, max_bytes)
+    if not body:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    return BatchInput(rows=unpack_array(body))
+
+
+async def _predict_chunk(batch: BatchInput, start: int, end: int, predict_fn: Callable, run: Callable):
+    chunk = await batch.chunk(start, end)
+    try:
+        return await run(predict_chunk, predict_fn, chunk)
+    except OSError as exc:
+        raise HTTPException(status_code=400, detail=f"Could not decode image in rows {start}-{end - 1}: {exc}")
+
+
+def _ndjson(start: int, digits: np.ndarray) -> str:
+    return "".join(
+        json.dumps({"index": start + offset, "predicted_digit": str(digit)}) + "\n"
+        for offset, digit in enumerate(digits)
+    )
+
+
+async def _ndjson_lines(batch: BatchInput, first_digits: np.ndarray, predict_fn: Callable,
+                        chunk_size: int, run: Callable):
+    yield _ndjson(0, first_digits)
+    for start in range(chunk_size, len(batch), chunk_size):
+        end = min(start + chunk_size, len(batch))
+        try:
+            digits = await _predict_chunk(batch, start, end, predict_fn, run)
+        except HTTPException as exc:
+            # The status line is already sent; report the failure in-band and stop
+            yield json.dumps({"index": start, "error": exc.detail, "status_code": exc.status_code}) + "\n"
+            return
+        yield _ndjson(start, digits)
+
+
+async def batch_prediction_response(request: Request, predict_fn: Callable[[np.ndarray], np.ndarray],
+                                    max_bytes: int, chunk_size: int = 256, stream_threshold: int = 1024,
+                                    max_files: int = 10000,
+                                    run: Callable[..., Awaitable] = run_in_threadpool):
+    """Handle one `/predict/batch` request with `predict_fn` mapping (n, 784) rows to scores.
+
+    Each chunk is decoded and predicted by `await run(predict_chunk, predict_fn, chunk)`,
+    which defaults to starlette's threadpool; apps pass their own to put chunks
+    behind admission control. `max_bytes` bounds a packed body as it is read,
+    including one sent without a Content-Length.
+    """
+    batch = await read_batch_input(request, max_files, max_bytes)
+    stream = request.query_params.get("stream")
+    if stream is None:
+        streaming = len(batch) >= stream_threshold
+    else:
+        streaming = stream.lower() in ("1", "true", "yes")
+
+    if not len(batch):
+        return JSONResponse({"predicted_digits": []})
+    # The first chunk runs before any response is sent, so overload and bad
+    # input surface as a proper status code rather than mid-stream
+    first_digits = await _predict_chunk(batch, 0, min(chunk_size, len(batch)), predict_fn, run)
+    if streaming:
+        return StreamingResponse(
+            _ndjson_lines(batch, first_digits, predict_fn, chunk_size, run), media_type="application/x-ndjson"
+        )
+
+    digits = [str(digit) for digit in first_digits]
+    for start in range(chunk_size, len(batch), chunk_size):
+        end = min(start + chunk_size, len(batch))
+        digits.extend(str(digit) for digit in await _predict_chunk(batch, start, end, predict_fn, run))
+    return JSONResponse({"predicted_digits": digits})
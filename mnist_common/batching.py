@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Histogram
+
+BATCH_SIZE_HISTOGRAM = Histogram(
+    'inference_batch_size', 'Number of requests merged into one model call',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+QUEUE_WAIT_HISTOGRAM = Histogram(
+    'inference_queue_wait_seconds', 'Time a request waits in the batching queue',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+class MicroBatcher:
+    """Gather concurrent inference requests into a single model call.
+
+    Requests are flushed as one batch when `max_batch_size` rows are queued or
+    when the oldest queued row has waited `max_wait_ms` milliseconds. The
+    model is called on a dedicated worker thread so the event loop stays free.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self):
+        """Start the worker thread and the background task that drains the queue."""
+        if self._worker is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and release the worker thread; `start` can run again."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, features: np.ndarray) -> np.ndarray:
+        """Queue one (784,) or (1, 784) row and wait for its prediction row."""
+        row, _ = await self.submit_timed(features)
+        return row
+
+    async def submit_timed(self, features: np.ndarray) -> Tuple[np.ndarray, Tuple[float, float, float]]:
+        """Like `submit`, also returning perf_counter times (enqueued, flushed, done)."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features.reshape(-1), time.perf_counter(), future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, float, asyncio.Future]]:
+        """Block for the first request, then gather more until full or timed out."""
+        items = [await self._queue.get()]
+        deadline = items[0][1] + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything that arrived while we were waiting is free to take.
+        while len(items) < self.max_batch_size and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            items = [item for item in items if not item[2].cancelled()]
+            if not items:
+                continue
+
+            flushed_at = time.perf_counter()
+            for _, enqueued_at, _ in items:
+                QUEUE_WAIT_HISTOGRAM.observe(flushed_at - enqueued_at)
+            BATCH_SIZE_HISTOGRAM.observe(len(items))
+
+            batch = np.stack([features for features, _, _ in items])
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.predict_fn, batch)
+            except Exception as exc:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            done_at = time.perf_counter()
+            for row, (_, enqueued_at, future) in zip(predictions, items):
+                if not future.done():
+                    future.set_result((row, (enqueued_at, flushed_at, done_at)))
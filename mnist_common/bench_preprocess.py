@@ -0,0 +1,86 @@
+"""Compare per-image preprocessing against the batched BatchPreprocessor.
+
+The uploads are decoded once up front, so only grayscale/resize, the copy
+into the feature array and scaling are timed; JPEG decoding costs the same on
+both paths and would otherwise dominate the measurement. Two corpora are
+run: 64x64 RGB photos, where PIL's convert/resize is most of the work, and
+28x28 grayscale digits, where those steps are skipped and the buffer handling
+is what is left.
+
+Usage: python -m mnist_common.bench_preprocess [--images 2000] [--batch-size 64]
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from mnist_common.preprocessing import thread_preprocessor
+
+
+CORPORA = (("64x64 RGB", (64, 64), "RGB"), ("28x28 L", (28, 28), "L"))
+
+
+def make_corpus(n_images, size=(64, 64), mode="RGB", seed=0):
+    """Random JPEGs, decoded once; 64x64 RGB is roughly what phone uploads of a digit look like."""
+    rng = np.random.default_rng(seed)
+    shape = (size[1], size[0], 3) if mode == "RGB" else (size[1], size[0])
+    corpus = []
+    for _ in range(n_images):
+        pixels = rng.integers(0, 256, size=shape, dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG")
+        image = Image.open(io.BytesIO(buffer.getvalue()))
+        image.load()
+        corpus.append(image)
+    return corpus
+
+
+def per_image(corpus, batch_size):
+    """The previous A06 path: one PIL convert/resize and one array per image."""
+    rows = []
+    for image in corpus:
+        image = image.convert("L").resize((28, 28))
+        rows.append(np.array(image).reshape(1, 784) / 255.0)
+    return np.concatenate(rows)
+
+
+def batched(corpus, batch_size):
+    """The apps' path: a long-lived preprocessor filling preallocated rows batch by batch."""
+    preprocessor = thread_preprocessor()
+    out = np.empty((len(corpus), 784), dtype=np.float32)
+    for start in range(0, len(corpus), batch_size):
+        chunk = corpus[start:start + batch_size]
+        preprocessor.transform(chunk, out=out[start:start + len(chunk)])
+    return out
+
+
+def images_per_second(fn, corpus, batch_size, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(corpus, batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for corpus_name, size, mode in CORPORA:
+        corpus = make_corpus(args.images, size, mode)
+        np.testing.assert_allclose(per_image(corpus, args.batch_size), batched(corpus, args.batch_size), atol=1e-6)
+
+        print(corpus_name)
+        for name, fn in (("per-image", per_image), ("batched", batched)):
+            rate = images_per_second(fn, corpus, args.batch_size, args.repeats)
+            print(f"{name:>10}: {rate:10.0f} images/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Microbenchmark the decode, preprocess and inference stages of the prediction path.
+
+Times each stage on its own over the load-test corpus, so a regression shows
+up in the stage that caused it rather than only in end-to-end latency:
+decode (PIL open + load of the upload bytes), preprocess (grayscale/resize into
+the float32 batch) and inference (backend predict at several batch sizes).
+Without --model, inference runs on random placeholder weights with the numpy
+backend, which times the forward pass but predicts nothing meaningful.
+Results are printed and written as JSON; an --output ending in .jsonl is
+appended to.
+
+Usage: python -m mnist_common.bench_stages [--mnist mnist.npz] [--backend numpy --model model/mnist]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from mnist_common.backends import load_backend
+from mnist_common.loadtest import git_commit, load_corpus, write_result
+from mnist_common.preprocessing import N_FEATURES, BatchPreprocessor, decode_image
+from mnist_common.weights import save_dense_layers
+
+
+def best_time(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def stage_result(seconds, items):
+    return {"us_per_item": seconds / items * 1e6, "items_per_second": items / seconds}
+
+
+def decode_all(uploads):
+    images = [decode_image(data) for data in uploads]
+    for image in images:
+        image.load()
+    return images
+
+
+def placeholder_model(directory):
+    """Random 784-128-10 Dense weights in the numpy backend's format."""
+    rng = np.random.default_rng(0)
+    prefix = os.path.join(directory, "placeholder")
+    save_dense_layers([
+        {"kernel": rng.normal(0, 0.05, (N_FEATURES, 128)), "bias": np.zeros(128), "activation": "relu"},
+        {"kernel": rng.normal(0, 0.05, (128, 10)), "bias": np.zeros(10), "activation": "softmax"},
+    ], prefix)
+    return prefix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of .png/.jpg uploads")
+    parser.add_argument("--mnist", help="mnist.npz whose test digits are used as uploads")
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--model", help="model path for the backend; random numpy weights if omitted")
+    parser.add_argument("--batch-sizes", default="1,32,256")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="bench_stages.json", help=".json for one run, .jsonl to append")
+    args = parser.parse_args()
+
+    uploads = [data for _, data, _ in load_corpus(args.corpus, args.mnist, args.images)]
+    n = len(uploads)
+    stages = {}
+
+    stages["decode"] = stage_result(best_time(lambda: decode_all(uploads), args.repeats), n)
+
+    images = decode_all(uploads)
+    preprocessor = BatchPreprocessor(n)
+    out = np.empty((n, N_FEATURES), dtype=np.float32)
+    stages["preprocess"] = stage_result(best_time(lambda: preprocessor.transform(images, out=out), args.repeats), n)
+    single = BatchPreprocessor(1)
+    stages["preprocess_single"] = stage_result(
+        best_time(lambda: [single.transform([image]) for image in images], args.repeats), n)
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = args.model or placeholder_model(directory)
+        model = load_backend(args.backend, model_path)
+        features = preprocessor.transform(images, out=out)
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            batches = [features[i:i + batch_size] for i in range(0, n, batch_size)]
+            model.predict(batches[0])  # warm-up
+            seconds = best_time(lambda: [model.predict(batch) for batch in batches], args.repeats)
+            stages[f"inference_batch_{batch_size}"] = stage_result(seconds, n)
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "backend": args.backend,
+        "model": args.model or "placeholder",
+        "images": n,
+        "stages": stages,
+    }
+    write_result(result, args.output)
+    for name, stage in stages.items():
+        print(f"{name:>22}: {stage['us_per_item']:9.1f} us/image  {stage['items_per_second']:12,.0f} images/s")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
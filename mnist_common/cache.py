@@ -0,0 +1,97 @@
+"""Bounded LRU/TTL cache of predictions keyed by a hash of the upload.
+
+Clients resend identical images on retries, so the raw upload bytes are hashed
+and looked up before anything is decoded. Optionally a second key is derived
+from the preprocessed 28x28 pixels, which also catches re-encoded copies of
+the same digit, at the cost of decoding and preprocessing first.
+
+Configured with MNIST_CACHE_ENABLED (default 1), MNIST_CACHE_SIZE (entries,
+default 10000), MNIST_CACHE_TTL (seconds, 0 = never expire) and
+MNIST_CACHE_PIXELS (default 0).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+from prometheus_client import Counter
+
+CACHE_HITS_COUNTER = Counter(
+    'prediction_cache_hits_total', 'Predictions served from the cache', ['app', 'key']
+)
+CACHE_MISSES_COUNTER = Counter(
+    'prediction_cache_misses_total', 'Prediction cache lookups that missed', ['app', 'key']
+)
+CACHE_EVICTIONS_COUNTER = Counter(
+    'prediction_cache_evictions_total', 'Entries evicted from the prediction cache', ['app', 'reason']
+)
+
+
+def bytes_key(contents: bytes) -> bytes:
+    """Fast 128-bit digest of the raw upload."""
+    return b"b" + hashlib.blake2b(contents, digest_size=16).digest()
+
+
+def pixels_key(pixels: np.ndarray) -> bytes:
+    """Digest of a preprocessed pixel array."""
+    return b"p" + hashlib.blake2b(np.ascontiguousarray(pixels).tobytes(), digest_size=16).digest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, app_name: str, max_entries: int = 10000, ttl_seconds: float = 0,
+                 enabled: bool = True, cache_pixels: bool = False):
+        self.app_name = app_name
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.enabled = enabled and max_entries > 0
+        self.cache_pixels = self.enabled and cache_pixels
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, app_name: str) -> "PredictionCache":
+        return cls(
+            app_name,
+            max_entries=int(os.environ.get("MNIST_CACHE_SIZE", "10000")),
+            ttl_seconds=float(os.environ.get("MNIST_CACHE_TTL", "0")),
+            enabled=os.environ.get("MNIST_CACHE_ENABLED", "1") == "1",
+            cache_pixels=os.environ.get("MNIST_CACHE_PIXELS", "0") == "1",
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return the cached value for `key`, or None."""
+        if not self.enabled:
+            return None
+        kind = "pixels" if key[:1] == b"p" else "bytes"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[1] < time.monotonic():
+                del self._entries[key]
+                CACHE_EVICTIONS_COUNTER.labels(self.app_name, "expired").inc()
+                entry = None
+            if entry is None:
+                CACHE_MISSES_COUNTER.labels(self.app_name, kind).inc()
+                return None
+            self._entries.move_to_end(key)
+        CACHE_HITS_COUNTER.labels(self.app_name, kind).inc()
+        return entry[0]
+
+    def put(self, key: Optional[Hashable], value):
+        """Store `value` under `key`, evicting the least recently used entries if full."""
+        if not self.enabled or key is None:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS_COUNTER.labels(self.app_name, "capacity").inc()
@@ -0,0 +1,98 @@
+"""Automated parity check of the inference backends on a tiny Dense model.
+
+Builds a small random 784-32-10 Keras model, exports it as .hdf5, .tflite and
+the memory-mapped NumPy format, loads each export through `load_backend` and
+asserts that the tflite and numpy scores match Keras within --atol on random
+batches of several sizes, then calls each backend from several threads at once
+with differently sized batches and checks every thread gets its own scores. Needs TensorFlow but no trained model or dataset,
+so it can run in CI; exits non-zero on any disagreement.
+
+Usage: python -m mnist_common.check_backends [--atol 1e-5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mnist_common.backends import export_tflite, load_backend
+from mnist_common.preprocessing import N_FEATURES
+from mnist_common.weights import dense_layers_from_keras, save_dense_layers
+
+BATCH_SIZES = (1, 7, 64)
+CONCURRENT_THREADS = 8
+CONCURRENT_CALLS = 50
+
+
+def build_tiny_model(seed: int = 0):
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+    return keras.Sequential([
+        keras.Input(shape=(N_FEATURES,)),
+        keras.layers.Dense(32, activation="relu"),
+        keras.layers.Dense(10, activation="softmax"),
+    ])
+
+
+def export_all(directory: str, seed: int = 0) -> dict:
+    """Write the tiny model in every backend's format; returns backend name -> model path."""
+    model = build_tiny_model(seed)
+    keras_path = os.path.join(directory, "tiny.h5")
+    model.save(keras_path)
+    tflite_path = os.path.join(directory, "tiny.tflite")
+    export_tflite(keras_path, tflite_path)
+    numpy_prefix = os.path.join(directory, "tiny")
+    save_dense_layers(dense_layers_from_keras(model), numpy_prefix)
+    return {"keras": keras_path, "tflite": tflite_path, "numpy": numpy_prefix}
+
+
+def concurrent_diff(backend, batches: list, expected: list) -> float:
+    """Max |score difference| when several threads share `backend`, each cycling through the batches."""
+    def worker(offset: int) -> float:
+        diff = 0.0
+        for call in range(CONCURRENT_CALLS):
+            index = (offset + call) % len(batches)
+            diff = max(diff, float(np.abs(backend.predict(batches[index]) - expected[index]).max()))
+        return diff
+
+    with ThreadPoolExecutor(CONCURRENT_THREADS) as pool:
+        return max(pool.map(worker, range(CONCURRENT_THREADS)))
+
+
+def check_parity(atol: float = 1e-5, seed: int = 0) -> dict:
+    """Max |score difference| from Keras per backend; raises AssertionError when one exceeds `atol`."""
+    rng = np.random.default_rng(seed)
+    batches = [rng.random((size, N_FEATURES), dtype=np.float32) for size in BATCH_SIZES]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = export_all(directory, seed)
+        reference = load_backend("keras", paths["keras"])
+        expected = [reference.predict(batch) for batch in batches]
+        diffs = {}
+        for name in ("tflite", "numpy"):
+            backend = load_backend(name, paths[name])
+            diffs[name] = max(float(np.abs(backend.predict(batch) - scores).max())
+                              for batch, scores in zip(batches, expected))
+            diffs[f"{name} (threads)"] = concurrent_diff(backend, batches, expected)
+    for name, diff in diffs.items():
+        assert diff <= atol, f"{name} backend differs from keras by {diff:.2e} (atol {atol:.0e})"
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+    try:
+        diffs = check_parity(args.atol)
+    except AssertionError as error:
+        sys.exit(str(error))
+    for name, diff in diffs.items():
+        print(f"{name:>16} max |diff| vs keras: {diff:.2e}")
+    print("Backends agree")
+
+
+if __name__ == "__main__":
+    main()
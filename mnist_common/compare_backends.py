@@ -0,0 +1,100 @@
+"""Check parity and compare startup time, RSS and throughput of inference backends.
+
+Each backend runs in a fresh subprocess, so startup time includes its imports
+and peak RSS is its own. Predictions on the MNIST test set are compared with
+the Keras model; the run fails if any backend disagrees on a digit or its
+scores differ by more than --atol.
+
+Usage:
+    python -m mnist_common.compare_backends --mnist mnist.npz \\
+        --keras mnist-epoch.hdf5 --tflite mnist.tflite --numpy model/mnist
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def load_test_set(mnist_path):
+    """Read x_test/y_test from the mnist.npz that keras.datasets.mnist downloads."""
+    with np.load(mnist_path) as data:
+        x_test = data["x_test"].reshape(-1, 784).astype(np.float32) / 255
+        return x_test, data["y_test"]
+
+
+def run_worker(backend, model_path, mnist_path, output_path, batch_size):
+    """Load one backend, score the test set and report timings as JSON on stdout."""
+    start = time.perf_counter()
+    from mnist_common.backends import load_backend
+    model = load_backend(backend, model_path)
+    startup = time.perf_counter() - start
+
+    x_test, _ = load_test_set(mnist_path)
+    model.predict(x_test[:batch_size])  # warm-up
+    start = time.perf_counter()
+    scores = np.concatenate([
+        model.predict(x_test[i:i + batch_size]) for i in range(0, len(x_test), batch_size)
+    ])
+    elapsed = time.perf_counter() - start
+    np.save(output_path, scores.astype(np.float32))
+
+    print(json.dumps({
+        "startup_seconds": startup,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "images_per_second": len(x_test) / elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mnist", required=True, help="path to mnist.npz")
+    parser.add_argument("--keras", required=True, help="reference .hdf5 model")
+    parser.add_argument("--tflite", help=".tflite conversion of the model")
+    parser.add_argument("--numpy", help="prefix of weights exported by mnist_common.weights")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "MODEL", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker[:2], args.mnist, args.worker[2], args.batch_size)
+        return
+
+    backends = [("keras", args.keras), ("tflite", args.tflite), ("numpy", args.numpy)]
+    _, y_test = load_test_set(args.mnist)
+    reference, failed = None, False
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'backend':>8} {'startup s':>10} {'RSS MB':>8} {'images/s':>10} {'accuracy':>9} {'max |diff|':>11}")
+        for name, model_path in backends:
+            if model_path is None:
+                continue
+            output_path = os.path.join(tmp, f"{name}.npy")
+            result = subprocess.run(
+                [sys.executable, "-m", "mnist_common.compare_backends", "--mnist", args.mnist,
+                 "--keras", args.keras, "--batch-size", str(args.batch_size),
+                 "--worker", name, model_path, output_path],
+                check=True, capture_output=True, text=True,
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            scores = np.load(output_path)
+            if reference is None:
+                reference = scores
+            diff = float(np.abs(scores - reference).max())
+            agree = bool((scores.argmax(axis=1) == reference.argmax(axis=1)).all())
+            failed |= diff > args.atol or not agree
+            accuracy = float((scores.argmax(axis=1) == y_test).mean())
+            print(f"{name:>8} {stats['startup_seconds']:>10.3f} {stats['peak_rss_mb']:>8.1f} "
+                  f"{stats['images_per_second']:>10.0f} {accuracy:>9.4f} {diff:>11.2e}")
+
+    if failed:
+        sys.exit("Backends disagree with the Keras reference")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Load-test the A06 and A07 prediction services with a corpus of digit uploads.
+
+The app is started on localhost, as a uvicorn subprocess or in this process
+(--in-process), or an already running service is targeted with --url. Uploads
+are replayed either closed-loop (--concurrency clients, each sending its next
+request when the previous one returns) or open-loop (--rate requests/s arriving
+on schedule no matter how fast the service answers; latency is measured from
+the scheduled send time, so queueing in a falling-behind client counts).
+The app's prediction cache is switched off (MNIST_CACHE_ENABLED=0) unless
+--cache is given: the corpus is replayed over and over, so with the cache on
+the run would mostly measure cache hits. Throughput and p50/p95/p99 latency
+of successful (200) responses, 503/504 rejections counted on their own so fast
+sheds do not flatter the percentiles, and the server's CPU and RSS are printed
+and written as JSON; an --output ending in .jsonl is appended to instead, keeping
+a history of runs to compare.
+
+Usage:
+    python -m mnist_common.loadtest --app a07 --mode closed --concurrency 16 --duration 20
+    python -m mnist_common.loadtest --app a06 --backend numpy --model model/mnist \\
+        --mode open --rate 200 --mnist mnist.npz --output runs.jsonl
+"""
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+import psutil
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import string, app directory, upload route and the env var naming the model for each app
+APPS = {
+    "a06": {"module": "Saicharan_CS5830_Assignment6:app", "app_dir": os.path.join(REPO_ROOT, "A06"),
+            "route": "/upload/", "model_env": "MNIST_MODEL_PATH"},
+    "a07": {"module": "app.main:app", "app_dir": os.path.join(REPO_ROOT, "A07", "src"),
+            "route": "/predict/", "model_env": "MNIST_WEIGHTS_PATH"},
+}
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+
+def encode_digit(pixels, image_format):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def load_corpus(corpus_dir=None, mnist_path=None, n_images=500, seed=0):
+    """(file name, bytes, content type) uploads from a directory of PNG/JPEG files,
+    MNIST test digits encoded alternately as PNG and JPEG, or random digits."""
+    if corpus_dir:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, "*"))):
+            content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+            if content_type:
+                with open(path, "rb") as f:
+                    corpus.append((os.path.basename(path), f.read(), content_type))
+        if not corpus:
+            raise ValueError(f"No .png/.jpg files in {corpus_dir}")
+        return corpus
+
+    if mnist_path:
+        with np.load(mnist_path) as data:
+            digits = data["x_test"][:n_images]
+    else:
+        digits = np.random.default_rng(seed).integers(0, 256, size=(n_images, 28, 28), dtype=np.uint8)
+    corpus = []
+    for i, pixels in enumerate(digits):
+        if i % 2:
+            corpus.append((f"{i}.jpg", encode_digit(pixels, "JPEG"), "image/jpeg"))
+        else:
+            corpus.append((f"{i}.png", encode_digit(pixels, "PNG"), "image/png"))
+    return corpus
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def app_env(app, backend=None, model_path=None, extra=(), cache=False):
+    env = {} if cache else {"MNIST_CACHE_ENABLED": "0"}
+    if backend:
+        env["MNIST_BACKEND"] = backend
+    if model_path:
+        env[APPS[app]["model_env"]] = os.path.abspath(model_path)
+    for item in extra:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def wait_until_listening(port, timeout=60.0, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not listen on port {port} within {timeout}s")
+
+
+class SubprocessServer:
+    """The app under uvicorn in a child process; CPU/RSS cover it and its workers."""
+
+    def __init__(self, app, env, workers=1):
+        self.port = free_port()
+        spec = APPS[app]
+        command = [sys.executable, "-m", "uvicorn", spec["module"], "--app-dir", spec["app_dir"],
+                   "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning",
+                   "--workers", str(workers)]
+        self.process = subprocess.Popen(command, cwd=spec["app_dir"], env=dict(os.environ, **env))
+        wait_until_listening(self.port, process=self.process)
+
+    def processes(self):
+        parent = psutil.Process(self.process.pid)
+        return [parent] + parent.children(recursive=True)
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+class InProcessServer:
+    """The app under uvicorn on a thread of this process; CPU/RSS include the load generator."""
+
+    def __init__(self, app, env):
+        import importlib
+        import uvicorn
+
+        os.environ.update(env)
+        spec = APPS[app]
+        sys.path.insert(0, spec["app_dir"])
+        module_name, _, attribute = spec["module"].partition(":")
+        asgi_app = getattr(importlib.import_module(module_name), attribute)
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        wait_until_listening(self.port)
+
+    def processes(self):
+        return [psutil.Process()]
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+class ResourceSampler:
+    """Samples CPU percent and RSS of a set of processes on a background thread."""
+
+    def __init__(self, get_processes, interval=0.5):
+        self.get_processes = get_processes
+        self.interval = interval
+        self.cpu, self.rss = [], []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        known = {}
+        while not self._stop.wait(self.interval):
+            cpu = rss = 0.0
+            try:
+                processes = self.get_processes()
+            except psutil.Error:
+                continue
+            for process in processes:
+                # cpu_percent() measures since the previous call on the same Process object
+                process = known.setdefault(process.pid, process)
+                try:
+                    cpu += process.cpu_percent(None)
+                    rss += process.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.cpu.append(cpu)
+            self.rss.append(rss / 2 ** 20)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        # The first sample of a process only primes its CPU counter
+        cpu = self.cpu[1:] or self.cpu or [0.0]
+        return {
+            "cpu_percent_mean": float(np.mean(cpu)),
+            "cpu_percent_max": float(np.max(cpu)),
+            "rss_mb_max": float(np.max(self.rss)) if self.rss else 0.0,
+            "samples": len(self.cpu),
+        }
+
+
+# Load shedding answers; counted apart from errors and kept out of the latency percentiles
+REJECTION_STATUSES = (503, 504)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []         # Successful (200) responses only
+        self.statuses = Counter()
+        self.dropped = 0
+
+    def summary(self, elapsed):
+        ok = self.statuses.get(200, 0)
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "requests": sum(self.statuses.values()),
+            "ok": ok,
+            "rejected": sum(self.statuses.get(status, 0) for status in REJECTION_STATUSES),
+            "errors": {str(status): count for status, count in self.statuses.items()
+                       if status != 200 and status not in REJECTION_STATUSES},
+            "rejections": {str(status): self.statuses[status] for status in REJECTION_STATUSES
+                           if self.statuses.get(status)},
+            "dropped": self.dropped,
+            "elapsed_seconds": elapsed,
+            "throughput_rps": ok / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99)),
+                "max": float(latencies.max()),
+            },
+        }
+
+
+async def send(client, url, upload, started, recorder):
+    try:
+        response = await client.post(url, files={"file": upload})
+        status = response.status_code
+    except httpx.HTTPError as error:
+        status = type(error).__name__
+    if status == 200:
+        recorder.latencies.append(time.perf_counter() - started)
+    recorder.statuses[status] += 1
+
+
+async def closed_loop(client, url, corpus, concurrency, duration, recorder):
+    deadline = time.perf_counter() + duration
+
+    async def user(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            await send(client, url, corpus[i % len(corpus)], time.perf_counter(), recorder)
+            i += concurrency
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+
+
+async def open_loop(client, url, corpus, rate, duration, max_outstanding, recorder, poisson=False, seed=0):
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    scheduled = start
+    outstanding = set()
+    i = 0
+    while True:
+        scheduled += rng.exponential(1 / rate) if poisson else 1 / rate
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(outstanding) >= max_outstanding:
+            recorder.dropped += 1
+        else:
+            task = asyncio.create_task(send(client, url, corpus[i % len(corpus)], scheduled, recorder))
+            outstanding.add(task)
+            task.add_done_callback(outstanding.discard)
+        i += 1
+    await asyncio.gather(*outstanding)
+
+
+async def run_load(url, corpus, args):
+    connections = args.concurrency if args.mode == "closed" else args.max_outstanding
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        if args.warmup > 0:
+            await closed_loop(client, url, corpus, args.concurrency, args.warmup, Recorder())
+        recorder = Recorder()
+        start = time.perf_counter()
+        if args.mode == "closed":
+            await closed_loop(client, url, corpus, args.concurrency, args.duration, recorder)
+        else:
+            await open_loop(client, url, corpus, args.rate, args.duration, args.max_outstanding, recorder,
+                            poisson=args.arrivals == "poisson")
+        return recorder, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_result(result, output):
+    """Write one run as JSON, or append it as a line when `output` is a .jsonl history."""
+    if output.endswith(".jsonl"):
+        with open(output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+    else:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--app", choices=sorted(APPS), help="start this app on localhost")
+    target.add_argument("--url", help="upload endpoint of an already running service")
+    parser.add_argument("--in-process", action="store_true", help="serve the app from a thread of this process")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--backend", help="MNIST_BACKEND for the app")
+    parser.add_argument("--model", help="model path for the app (.hdf5, .tflite or weight prefix)")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the app")
+    parser.add_argument("--cache", action="store_true", help="leave the app's prediction cache on")
+    parser.add_argument("--corpus", help="directory of .png/.jpg uploads")
+    parser.add_argument("--mnist", help="mnist.npz whose test digits are used as uploads")
+    parser.add_argument("--images", type=int, default=500, help="uploads generated from --mnist or at random")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop clients (also used for warm-up)")
+    parser.add_argument("--rate", type=float, default=100.0, help="open-loop arrivals per second")
+    parser.add_argument("--arrivals", choices=("uniform", "poisson"), default="uniform")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="open-loop cap on in-flight requests")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default="loadtest.json", help=".json for one run, .jsonl to append")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.mnist, args.images)
+    server = None
+    if args.app:
+        env = app_env(args.app, args.backend, args.model, args.env, cache=args.cache)
+        server = InProcessServer(args.app, env) if args.in_process else SubprocessServer(args.app, env, args.server_workers)
+        url = f"http://127.0.0.1:{server.port}{APPS[args.app]['route']}"
+        get_processes = server.processes
+    else:
+        url = args.url
+        get_processes = lambda: [] # noqa: E731 - the remote server is not ours to sample
+
+    try:
+        with ResourceSampler(get_processes) as sampler:
+            recorder, elapsed = asyncio.run(run_load(url, corpus, args))
+    finally:
+        if server is not None:
+            server.stop()
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "target": {"app": args.app, "url": url, "in_process": args.in_process,
+                   "server_workers": args.server_workers, "backend": args.backend,
+                   "cache": args.cache if args.app else None},
+        "load": {"mode": args.mode, "concurrency": args.concurrency, "rate": args.rate, "arrivals": args.arrivals,
+                 "duration": args.duration, "warmup": args.warmup, "corpus_images": len(corpus)},
+        **recorder.summary(elapsed),
+        "server": sampler.summary(),
+    }
+    write_result(result, args.output)
+
+    latency = result["latency_ms"]
+    print(f"{result['ok']}/{result['requests']} ok, {result['rejected']} rejected, {result['dropped']} dropped, "
+          f"{result['throughput_rps']:.1f} req/s")
+    print(f"latency ms (200 only): p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  "
+          f"max {latency['max']:.1f}")
+    print(f"server: CPU {result['server']['cpu_percent_mean']:.0f}% mean / "
+          f"{result['server']['cpu_percent_max']:.0f}% max, RSS {result['server']['rss_mb_max']:.0f} MB max")
+    if result["rejections"]:
+        print(f"rejections: {result['rejections']}")
+    if result["errors"]:
+        print(f"errors: {result['errors']}")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
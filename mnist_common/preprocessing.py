@@ -0,0 +1,86 @@
+import io
+import threading
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (28, 28)
+N_FEATURES = IMAGE_SIZE[0] * IMAGE_SIZE[1]
+
+ImageInput = Union[Image.Image, bytes, bytearray, memoryview]
+
+
+def decode_image(data: ImageInput) -> Image.Image:
+    """Open raw image bytes with PIL; images that are already decoded pass through."""
+    if isinstance(data, Image.Image):
+        return data
+    return Image.open(io.BytesIO(data))
+
+
+def to_mnist_pixels(image: Image.Image) -> Image.Image:
+    """Convert to 8-bit grayscale and then resize to 28x28, skipping no-op steps."""
+    if image.mode != "L":
+        image = image.convert("L")
+    if image.size != IMAGE_SIZE:
+        image = image.resize(IMAGE_SIZE)
+    return image
+
+
+_thread_state = threading.local()
+
+
+def thread_preprocessor() -> "BatchPreprocessor":
+    """The calling thread's long-lived BatchPreprocessor, created on first use."""
+    preprocessor = getattr(_thread_state, "preprocessor", None)
+    if preprocessor is None:
+        preprocessor = _thread_state.preprocessor = BatchPreprocessor()
+    return preprocessor
+
+
+def preprocess_images(images: Sequence[ImageInput], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Turn images or encoded image bytes into a contiguous float32 (N, 784) array in [0, 1].
+
+    Runs on the calling thread's reused buffers. Without `out` the result is a
+    view into them that the thread's next call overwrites; pass `out` for a
+    result that has to outlive it.
+    """
+    return thread_preprocessor().transform(images, out=out)
+
+
+class BatchPreprocessor:
+    """Preprocess batches of images into reusable, preallocated buffers.
+
+    Each image's pixels are copied straight into one row of a uint8 staging
+    buffer, and the whole batch is scaled to float32 with a single vectorized
+    operation. Results returned without an explicit `out` are views into the
+    internal buffer and are overwritten by the next call. Instances are not
+    thread-safe; use one per thread, as `thread_preprocessor` does.
+    """
+
+    def __init__(self, capacity: int = 32):
+        self._staging = np.empty((0, N_FEATURES), dtype=np.uint8)
+        self._output = np.empty((0, N_FEATURES), dtype=np.float32)
+        self._reserve(capacity)
+
+    def _reserve(self, n: int):
+        if n > len(self._staging):
+            self._staging = np.empty((n, N_FEATURES), dtype=np.uint8)
+            self._output = np.empty((n, N_FEATURES), dtype=np.float32)
+
+    def transform(self, images: Sequence[ImageInput], out: Optional[np.ndarray] = None) -> np.ndarray:
+        n = len(images)
+        if out is None:
+            self._reserve(n)
+            out = self._output[:n]
+        elif out.shape != (n, N_FEATURES) or out.dtype != np.float32 or not out.flags.c_contiguous:
+            raise ValueError(f"out must be a C-contiguous float32 array of shape ({n}, {N_FEATURES})")
+        self._reserve(n)
+        staging = self._staging[:n]
+
+        for i, data in enumerate(images):
+            pixels = to_mnist_pixels(decode_image(data))
+            staging[i] = np.asarray(pixels, dtype=np.uint8).reshape(N_FEATURES)
+
+        np.multiply(staging, np.float32(1.0 / 255.0), out=out, dtype=np.float32)
+        return out
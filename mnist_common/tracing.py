@@ -0,0 +1,145 @@
+"""Per-stage latency histograms and optional span export for the prediction path.
+
+Every request gets a `RequestTrace`; each stage it goes through (body read,
+decode, preprocess, queue wait, inference, serialization) is observed in the
+`prediction_stage_seconds` histogram. When MNIST_TRACE_FILE is set, the stages
+are also written as OpenTelemetry-style span records, one JSON object per line,
+by a background thread so the request never waits on the file.
+"""
+import atexit
+import ipaddress
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import Histogram
+
+DEFAULT_STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+STAGES = ("body_read", "decode", "preprocess", "queue_wait", "inference", "serialize")
+
+
+def _buckets_from_env(name: str, default: tuple) -> tuple:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return tuple(sorted(float(bucket) for bucket in value.split(",")))
+
+
+STAGE_LATENCY_HISTOGRAM = Histogram(
+    'prediction_stage_seconds', 'Time spent in each stage of a prediction request',
+    ['app', 'stage'], buckets=_buckets_from_env("MNIST_STAGE_BUCKETS", DEFAULT_STAGE_BUCKETS)
+)
+
+
+def client_class(host: Optional[str]) -> str:
+    """Bucket a client address into loopback/private/public so metric labels stay bounded."""
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return "unknown"
+    if address.is_loopback:
+        return "loopback"
+    if address.is_private:
+        return "private"
+    return "public"
+
+
+class SpanFileExporter:
+    """Append span records to a JSON-lines file from a daemon thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, spans):
+        self._queue.put(spans)
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        with open(self.path, "a") as f:
+            while True:
+                spans = self._queue.get()
+                if spans is None:
+                    break
+                f.writelines(json.dumps(span) + "\n" for span in spans)
+                if self._queue.empty():
+                    f.flush()
+
+
+_exporter: Optional[SpanFileExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> Optional[SpanFileExporter]:
+    """Return the process-wide span exporter, or None when MNIST_TRACE_FILE is unset."""
+    global _exporter
+    path = os.environ.get("MNIST_TRACE_FILE")
+    if not path:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = SpanFileExporter(path)
+    return _exporter
+
+
+class RequestTrace:
+    """Time the stages of one request and, optionally, export them as spans."""
+
+    def __init__(self, app_name: str, name: str = "predict"):
+        self.app_name = app_name
+        self.name = name
+        self.exporter = get_exporter()
+        self.trace_id = uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self._wall_start_ns = time.time_ns()
+        self._perf_start = time.perf_counter()
+        self._spans = []
+
+    def _wall_ns(self, perf_time: float) -> int:
+        return self._wall_start_ns + int((perf_time - self._perf_start) * 1e9)
+
+    def record(self, stage: str, start: float, end: float, **attributes):
+        """Record a stage measured elsewhere, given perf_counter start/end times."""
+        STAGE_LATENCY_HISTOGRAM.labels(self.app_name, stage).observe(end - start)
+        if self.exporter is not None:
+            self._spans.append(self._span(stage, uuid.uuid4().hex[:16], self.span_id, start, end, attributes))
+
+    @contextmanager
+    def stage(self, stage: str, **attributes):
+        """Time the enclosed block as `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.perf_counter(), **attributes)
+
+    def finish(self, **attributes):
+        """Close the request span and hand all spans to the exporter."""
+        if self.exporter is None:
+            return
+        root = self._span(self.name, self.span_id, None, self._perf_start, time.perf_counter(), attributes)
+        self.exporter.export([root] + self._spans)
+
+    def _span(self, name, span_id, parent_id, start, end, attributes):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": span_id,
+            "parent_span_id": parent_id,
+            "name": name,
+            "start_time_unix_nano": self._wall_ns(start),
+            "end_time_unix_nano": self._wall_ns(end),
+            "attributes": {"service.name": self.app_name, **attributes},
+        }
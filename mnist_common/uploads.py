@@ -0,0 +1,66 @@
+import os
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundary and part headers around the file body.
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> bytes:
+    """Read an upload into memory, failing with 413 once it exceeds `max_bytes`."""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+        buffer += chunk
+    return bytes(buffer)
+
+
+async def read_request_body(request: Request, max_bytes: int) -> bytes:
+    """Read a request body into memory, failing with 413 once it exceeds `max_bytes`.
+
+    Unlike the middleware, which only sees Content-Length, this also bounds
+    chunked bodies sent without one, so the limit is not optional here.
+    """
+    buffer = bytearray()
+    async for chunk in request.stream():
+        if len(buffer) + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def payload_limit_middleware(max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+    """Build an HTTP middleware that rejects bodies whose Content-Length is too large.
+
+    This runs before the multipart form is parsed, so oversized requests are
+    turned away without being spooled anywhere. `path_limits` overrides the
+    limit for specific paths, such as batch endpoints.
+    """
+    path_limits = path_limits or {}
+
+    async def limit_payload(request: Request, call_next):
+        limit = path_limits.get(request.url.path, max_bytes)
+        content_length = request.headers.get("content-length")
+        if content_length is not None and content_length.isdigit():
+            if int(content_length) > limit + MULTIPART_OVERHEAD:
+                return JSONResponse(
+                    status_code=413, content={"detail": f"Upload exceeds {limit} bytes"}
+                )
+        return await call_next(request)
+    return limit_payload
+
+
+def persist_upload(contents: bytes, file_path: str):
+    """Write an upload to disk for auditing; meant to run as a background task."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(contents)
+    os.replace(tmp_path, file_path)
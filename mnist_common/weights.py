@@ -0,0 +1,120 @@
+"""Export Dense Keras models to a flat, memory-mappable weight file.
+
+The export is a pair of files: `<name>.npy` holds every kernel and bias as one
+float32 array, and `<name>.json` records where each layer's tensors live in it.
+Loading maps the .npy read-only, so any number of worker processes share a
+single copy of the weights through the OS page cache and start in
+milliseconds without importing TensorFlow.
+
+Usage: python -m mnist_common.weights MODEL.hdf5 OUTPUT_PREFIX
+"""
+import json
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+# Tensors start on 64-byte boundaries so every mapped view is cache-line aligned.
+ALIGNMENT = 16
+SKIPPED_LAYERS = ("InputLayer", "Dropout", "Flatten")
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": lambda x: np.reciprocal(1 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softmax": _softmax,
+}
+
+
+def dense_layers_from_keras(model) -> List[Dict]:
+    """Pull (kernel, bias, activation) out of every Dense layer of a Keras model."""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in SKIPPED_LAYERS:
+            continue
+        if kind != "Dense":
+            raise ValueError(f"Only Dense models can be exported, found {kind} layer '{layer.name}'")
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{activation}' in layer '{layer.name}'")
+        weights = layer.get_weights()
+        kernel = weights[0]
+        bias = weights[1] if len(weights) > 1 else np.zeros(kernel.shape[1], dtype=np.float32)
+        layers.append({"kernel": kernel, "bias": bias, "activation": activation})
+    return layers
+
+
+def save_dense_layers(layers: List[Dict], prefix: str):
+    """Write layers to `<prefix>.npy` and `<prefix>.json`."""
+    manifest, offset = [], 0
+    for layer in layers:
+        entry = {"activation": layer["activation"]}
+        for name in ("kernel", "bias"):
+            shape = list(np.shape(layer[name]))
+            entry[name] = {"offset": offset, "shape": shape}
+            offset += -(-int(np.prod(shape)) // ALIGNMENT) * ALIGNMENT
+        manifest.append(entry)
+
+    flat = np.zeros(offset, dtype=np.float32)
+    for layer, entry in zip(layers, manifest):
+        for name in ("kernel", "bias"):
+            start = entry[name]["offset"]
+            values = np.asarray(layer[name], dtype=np.float32).ravel()
+            flat[start:start + values.size] = values
+
+    np.save(f"{prefix}.npy", flat)
+    with open(f"{prefix}.json", "w") as f:
+        json.dump({"layers": manifest}, f, indent=2)
+
+
+class DenseNetwork:
+    """Pure NumPy forward pass over memory-mapped Dense layer weights."""
+
+    def __init__(self, prefix: str):
+        with open(f"{prefix}.json", "r") as f:
+            manifest = json.load(f)["layers"]
+        self._flat = np.load(f"{prefix}.npy", mmap_mode="r")
+        self.layers = [
+            (self._view(entry["kernel"]), self._view(entry["bias"]), ACTIVATIONS[entry["activation"]])
+            for entry in manifest
+        ]
+
+    def _view(self, spec: Dict) -> np.ndarray:
+        size = int(np.prod(spec["shape"]))
+        return self._flat[spec["offset"]:spec["offset"] + size].reshape(spec["shape"])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return class probabilities for a (N, 784) batch."""
+        x = np.asarray(batch, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+
+def load_dense_network(prefix: str) -> DenseNetwork:
+    """Map an exported model; pages are shared with every other process using it."""
+    return DenseNetwork(prefix)
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    from tensorflow.keras.models import load_model
+
+    model_path, prefix = sys.argv[1:]
+    save_dense_layers(dense_layers_from_keras(load_model(model_path)), prefix)
+    print(f"Wrote {prefix}.npy and {prefix}.json")
+
+
+if __name__ == "__main__":
+    main()
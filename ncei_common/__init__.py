@@ -0,0 +1 @@
+"""Helpers shared by the A02 and A04 NCEI Local Climatological Data pipelines."""
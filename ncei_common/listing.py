@@ -0,0 +1,134 @@
+"""Cached, indexed listing of the NCEI LCD year pages.
+
+Each year's directory page lists thousands of station CSVs. The listing is
+parsed once into a JSON manifest (name, size, last-modified per file) kept
+under the cache directory. It is reused until its TTL runs out and then
+revalidated with a conditional GET, so an unchanged page costs one 304
+response and no parsing.
+
+Usage: python -m ncei_common.listing YEAR [--ttl SECONDS] [--cache-dir DIR]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+BASE_URL = "https://www.ncei.noaa.gov/data/local-climatological-data/access/"
+DEFAULT_CACHE_DIR = os.environ.get(
+    "NCEI_LISTING_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "ncei_listing")
+)
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# One match per CSV link of the Apache directory index, in either its table or
+# <pre> layout: href, then the optional modification time and size columns.
+LINK_PATTERN = re.compile(
+    r'<a href="([^"/?]+\.csv)">[^<]*</a>'
+    r'(?:\s*</td>\s*<td[^>]*>)?\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2})?'
+    r'\s*(?:</td>\s*<td[^>]*>)?\s*(\d+(?:\.\d+)?[KMG]?)?'
+)
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(size: Optional[str]) -> Optional[int]:
+    """Convert an index size such as '4.1M' to an approximate byte count."""
+    if not size:
+        return None
+    unit = SIZE_UNITS.get(size[-1], 1)
+    return int(float(size.rstrip("KMG")) * unit)
+
+
+def parse_listing(html: str) -> List[Dict]:
+    """Extract every CSV entry of a year page with a single regex scan."""
+    return [
+        {"name": name, "size": parse_size(size), "last_modified": modified or None}
+        for name, modified, size in LINK_PATTERN.findall(html)
+    ]
+
+
+def listing_path(year, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{year}.json")
+
+
+def read_cached_listing(year, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[Dict]:
+    """The cached manifest for `year`, or None if it was never fetched."""
+    try:
+        with open(listing_path(year, cache_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_listing(listing: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = f"{path}.part"
+    with open(partial_path, "w") as f:
+        json.dump(listing, f)
+    os.replace(partial_path, path)
+
+
+def load_listing(year, base_url: str = BASE_URL, cache_dir: str = DEFAULT_CACHE_DIR,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, session=None) -> Dict:
+    """The manifest for `year`, refreshed from the server only once it is older than `ttl_seconds`.
+
+    A stale manifest is revalidated with If-None-Match / If-Modified-Since.
+    If the server cannot be reached, a stale manifest is still returned.
+    """
+    cached = read_cached_listing(year, cache_dir)
+    if cached is not None and time.time() - cached["fetched_at"] < ttl_seconds:
+        return cached
+
+    url = f"{base_url.rstrip('/')}/{year}/"
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("page_last_modified"):
+            headers["If-Modified-Since"] = cached["page_last_modified"]
+    try:
+        response = (session or requests).get(url, headers=headers, timeout=60)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException as error:
+        if cached is None:
+            raise
+        logging.warning("Using stale listing for %s, refresh failed: %s", year, error)
+        return cached
+
+    if response.status_code == 304:
+        listing = dict(cached, fetched_at=time.time())
+    else:
+        listing = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "page_last_modified": response.headers.get("Last-Modified"),
+            "files": parse_listing(response.text),
+        }
+    _write_listing(listing, listing_path(year, cache_dir))
+    return listing
+
+
+def file_names(listing: Dict) -> List[str]:
+    return [entry["name"] for entry in listing["files"]]
+
+
+def unknown_files(names: Iterable[str], listing: Dict) -> List[str]:
+    """The entries of `names` that the year's listing does not contain."""
+    available = set(file_names(listing))
+    return [name for name in names if name not in available]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the cached NCEI listing of a year")
+    parser.add_argument("year")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL_SECONDS)
+    args = parser.parse_args()
+    listing = load_listing(args.year, args.base_url, args.cache_dir, args.ttl)
+    print(f"{len(listing['files'])} files listed for {args.year} in {listing_path(args.year, args.cache_dir)}")